@@ -8,17 +8,55 @@ from fastapi.middleware.cors import CORSMiddleware
 from dashboard.routes import dashboard_router
 from history.routes import history_router
 from config import routes as config_routes
+from db.migrate import apply_migrations
+from utils.email_sender import run_outbox_worker
+from core.cleanup import run_cleanup_worker
+from core.scheduler import run_scheduler
+from core.scan_worker import run_worker
+from core import report_pool
+from utils import metrics
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+import asyncio, os
 load_dotenv()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("RUN_MIGRATIONS", "true").lower() == "true":
+        await apply_migrations()
+
+    background_tasks = [
+        asyncio.create_task(run_outbox_worker()),
+        asyncio.create_task(run_cleanup_worker()),
+    ]
+    # Set SCHEDULER_ENABLED=false on workers that shouldn't start scheduled scans
+    if os.getenv("SCHEDULER_ENABLED", "true").lower() == "true":
+        background_tasks.append(asyncio.create_task(run_scheduler()))
+    # Single-container deploys run scans here; set SCAN_WORKER_IN_PROCESS=false once
+    # dedicated workers (python -m core.scan_worker) are running
+    if os.getenv("SCAN_WORKER_IN_PROCESS", "true").lower() == "true":
+        background_tasks.append(asyncio.create_task(run_worker()))
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    report_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth_router)
 app.include_router(dashboard_router)
 app.include_router(history_router)
 app.include_router(config_routes.router)
 
+# Prometheus scrape endpoint; kept out of the API docs
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://link-sweep.vercel.app", "http://localhost:3000/"],  # frontend origin
@@ -26,6 +64,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it is outermost and times CORS handling too
+app.add_middleware(metrics.MetricsMiddleware)
 
 def custom_openapi():
     if app.openapi_schema:
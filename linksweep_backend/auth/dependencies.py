@@ -3,8 +3,46 @@ from jose import JWTError, jwt
 from db.connection import get_connection
 from auth.utils import SECRET_KEY, ALGORITHM
 from typing import Optional
+from collections import OrderedDict
+import os, time
 
-async def get_current_user(request: Request):
+# Short-lived cache of users ⨝ roles rows, keyed by UserID.
+# Set USER_CACHE_TTL_SECONDS=0 to always hit the database.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+
+_user_cache: "OrderedDict[int, tuple[float, dict]]" = OrderedDict()
+
+def _get_cached_user(user_id: int) -> Optional[dict]:
+    entry = _user_cache.get(user_id)
+    if entry is None:
+        return None
+
+    expires_at, user = entry
+    if time.monotonic() >= expires_at:
+        _user_cache.pop(user_id, None)
+        return None
+
+    _user_cache.move_to_end(user_id)
+    return dict(user)
+
+def _cache_user(user_id: int, user: dict):
+    if USER_CACHE_TTL_SECONDS <= 0 or USER_CACHE_MAX_SIZE <= 0:
+        return
+
+    _user_cache[user_id] = (time.monotonic() + USER_CACHE_TTL_SECONDS, dict(user))
+    _user_cache.move_to_end(user_id)
+    while len(_user_cache) > USER_CACHE_MAX_SIZE:
+        _user_cache.popitem(last=False)
+
+def invalidate_user(user_id: Optional[int] = None):
+    """Drop a cached user (or every cached user) after a role, password or account change."""
+    if user_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(int(user_id), None)
+
+def get_token_user_id(request: Request) -> int:
     token = request.cookies.get("access_token")
     if not token:
         raise HTTPException(
@@ -20,13 +58,24 @@ async def get_current_user(request: Request):
     except JWTError:
         raise HTTPException(status_code=401, detail="Token verification failed")
 
+    # Only "sub" is trusted here: the "role" claim goes stale after /auth/promote
+    # and /auth/refresh writes the RoleID into it, so roles always come from the DB row.
+    return int(user_id)
+
+async def get_current_user(request: Request):
+    user_id = get_token_user_id(request)
+
+    cached = _get_cached_user(user_id)
+    if cached is not None:
+        return cached
+
     conn = await get_connection()
     user = await conn.fetchrow("""
         SELECT u.*, r."RoleName"
         FROM users u
         JOIN roles r ON u."RoleID" = r."RoleID"
         WHERE u."UserID" = $1
-    """, int(user_id))
+    """, user_id)
     await conn.close()
 
     if not user:
@@ -34,10 +83,11 @@ async def get_current_user(request: Request):
 
     user_dict = dict(user)
     user_dict["role"] = user_dict.pop("RoleName")  # Put 'Admin' / 'User' as role key
+    _cache_user(user_id, user_dict)
     return user_dict
 
 
 async def admin_required(user=Depends(get_current_user)):
     if user.get("RoleID") != 1:  # Assuming 1 is the RoleID for admin
         raise HTTPException(status_code=403, detail="Admin access required")
-    return user
\ No newline at end of file
+    return user
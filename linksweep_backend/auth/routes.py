@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, Response, Request, APIRouter, Depends, status, Body
 from auth.schemas import SignupRequest, LoginRequest, TokenResponse, RefreshResponse, PromoteRequest, PasswordResetRequest, OTPVerifyRequest, ResetPasswordRequest, ChangePasswordRequest
-from auth.utils import hash_password, verify_password, create_access_token, create_refresh_token, decode_token
-from auth.dependencies import get_current_user, admin_required
+from auth.utils import hash_password, verify_password, verify_and_update_password, create_access_token, create_refresh_token, decode_token
+from auth.dependencies import get_current_user, admin_required, invalidate_user
 from db.connection import get_connection
 from dotenv import load_dotenv
 import os
 from jose import jwt, JWTError
 from utils.security import generate_random_password
-from utils.email_sender import send_email
+from utils.email_sender import queue_email
 from utils.otp_utils import generate_otp_token, verify_otp_token
 from passlib.context import CryptContext
 import secrets, hashlib, hmac, time
@@ -38,14 +38,7 @@ async def signup(data: SignupRequest):
         raise HTTPException(status_code=400, detail="User with this email already exists")
 
     raw_password = generate_random_password()
-    hashed_password = hash_password(raw_password)
-
-    await conn.execute("""
-        INSERT INTO users (email, username, password, "RoleID", "firstName", "lastName", "createdAt", "modifiedAt")
-        VALUES ($1, $2, $3, $4, $5, $6, NOW(), NOW())
-    """, data.email, data.username, hashed_password, data.role_id, data.firstName, data.lastName)
-
-    await conn.close()
+    hashed_password = await hash_password(raw_password)
 
     # Prepare dynamic email content
     subject = "🎉 Welcome to LinkSweep - Your Login Credentials"
@@ -93,7 +86,15 @@ async def signup(data: SignupRequest):
         </html>
     """
 
-    send_email(data.email, subject, plain_text, html_content)
+    # User row and welcome email commit together; the outbox worker delivers it
+    async with conn.transaction():
+        await conn.execute("""
+            INSERT INTO users (email, username, password, "RoleID", "firstName", "lastName", "createdAt", "modifiedAt")
+            VALUES ($1, $2, $3, $4, $5, $6, NOW(), NOW())
+        """, data.email, data.username, hashed_password, data.role_id, data.firstName, data.lastName)
+        await queue_email(data.email, subject, plain_text, html_content, conn=conn)
+
+    await conn.close()
 
     return {"message": "User created successfully and email sent"}
 
@@ -108,9 +109,19 @@ async def login(data: LoginRequest, response: Response):
     """, data.email)
     await conn.close()
 
-    if not user or not verify_password(data.password, user["password"]):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    valid, new_hash = await verify_and_update_password(data.password, user["password"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # Transparently upgrade hashes created with an older bcrypt cost
+    if new_hash:
+        conn = await get_connection()
+        await conn.execute('UPDATE users SET password = $1 WHERE "UserID" = $2', new_hash, user["UserID"])
+        await conn.close()
+
     access_token = create_access_token({
         "sub": str(user["UserID"]),
         "email": user["email"],
@@ -293,6 +304,7 @@ async def toggle_admin_role(request: PromoteRequest):
     )
 
     await conn.close()
+    invalidate_user(request.user_id)
     return {"message": f"User {action} successfully"}
 
 @auth_router.get("/roles")
@@ -345,7 +357,7 @@ async def request_password_reset(data: PasswordResetRequest):
             </body>
         </html>
     """
-    send_email(email, subject, plain_text, html_content)
+    await queue_email(email, subject, plain_text, html_content, conn=conn)
 
     await conn.close()
     return {"token": token}
@@ -373,12 +385,15 @@ async def reset_password(data: ResetPasswordRequest):
         if not email:
             raise HTTPException(status_code=400, detail="Invalid token. Cannot reset password.")
 
-        hashed_password = hash_password(data.new_password)
+        hashed_password = await hash_password(data.new_password)
 
         conn = await get_connection()
-        await conn.execute('UPDATE users SET password = $1 WHERE email = $2', hashed_password, email)
+        user_id = await conn.fetchval('UPDATE users SET password = $1 WHERE email = $2 RETURNING "UserID"', hashed_password, email)
         await conn.close()
 
+        if user_id is not None:
+            invalidate_user(user_id)
+
         return {
             "success": True,
             "message": "Password reset successfully."
@@ -393,13 +408,14 @@ async def change_password(data: ChangePasswordRequest, user: dict = Depends(get_
         conn = await get_connection()
         user_record = await conn.fetchrow('SELECT password FROM users WHERE "UserID" = $1', user["UserID"])
 
-        if not user_record or not verify_password(data.current_password, user_record["password"]):
+        if not user_record or not await verify_password(data.current_password, user_record["password"]):
             raise HTTPException(status_code=400, detail="Current password is incorrect.")
 
-        hashed_new_password = hash_password(data.new_password)
+        hashed_new_password = await hash_password(data.new_password)
 
         await conn.execute('UPDATE users SET password = $1 WHERE "UserID" = $2', hashed_new_password, user["UserID"])
         await conn.close()
+        invalidate_user(user["UserID"])
 
         return {
             "success": True,
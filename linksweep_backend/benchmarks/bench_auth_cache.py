@@ -0,0 +1,65 @@
+"""
+Requests/sec on GET /auth/me with and without the in-process user cache.
+
+Needs a reachable DATABASE_URL and an existing user:
+
+    python -m benchmarks.bench_auth_cache --user-id 1 --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app import app
+from auth import dependencies
+from auth.utils import create_access_token
+from benchmarks.asgi_client import call
+
+
+async def run(user_id: int, total: int, concurrency: int) -> float:
+    token = create_access_token({"sub": str(user_id)})
+    cookies = {"access_token": token}
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            status, body = await call(app, "GET", "/auth/me", cookies=cookies)
+            if status != 200:
+                raise RuntimeError(f"/auth/me returned {status}: {body[:200]!r}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    ttl = dependencies.USER_CACHE_TTL_SECONDS or 30
+
+    dependencies.USER_CACHE_TTL_SECONDS = 0
+    dependencies.invalidate_user()
+    uncached = await run(args.user_id, args.requests, args.concurrency)
+
+    dependencies.USER_CACHE_TTL_SECONDS = ttl
+    dependencies.invalidate_user()
+    cached = await run(args.user_id, args.requests, args.concurrency)
+
+    print(json.dumps({
+        "endpoint": "/auth/me",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "rps_without_cache": round(uncached, 1),
+        "rps_with_cache": round(cached, 1),
+        "speedup": round(cached / uncached, 2) if uncached else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Crawler throughput against the synthetic site in benchmarks.fixture_site.
+Runs offline: the site is served from a local subprocess and nothing else
+is contacted, except Postgres when --db is given.
+
+    python -m benchmarks.bench_crawl --pages 500 --depth 3 --repeat 3
+    python -m benchmarks.bench_crawl --db --output bench.json
+
+With --db the results are written the way run_scan writes them
+(insert_link_results) inside a transaction that is rolled back, so the
+database is left unchanged. The site, the crawl settings and the commit are
+all recorded in the JSON, so numbers from different commits can be compared
+when the options match. The default --throttle 0 turns off the per-link
+politeness delay, which would otherwise dominate the timings.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks import fixture_site
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux; children covers the fixture site and crawl shards
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(own / 1024, 1), round(children / 1024, 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def insert_and_roll_back(results) -> float:
+    from db.connection import get_connection
+    from db.linkresults import insert_link_results
+
+    conn = await get_connection()
+    try:
+        transaction = conn.transaction()
+        await transaction.start()
+        try:
+            started = time.perf_counter()
+            await insert_link_results(conn, 0, 0, results, datetime.now())
+            return time.perf_counter() - started
+        finally:
+            await transaction.rollback()
+    finally:
+        await conn.close()
+
+
+async def run_once(base_url: str, args) -> dict:
+    from core.crawler import start_crawl
+    from core.sharded_crawl import start_sharded_crawl
+
+    started = time.perf_counter()
+    if args.processes > 1:
+        results = await start_sharded_crawl(base_url, args.depth, args.timeout, [], args.use_cache, args.processes)
+    else:
+        results = await start_crawl(base_url, args.depth, args.timeout, [], args.use_cache)
+    crawl_seconds = time.perf_counter() - started
+
+    pages = len({r["sourcePage"] for r in results})
+    run = {
+        "crawl_seconds": round(crawl_seconds, 3),
+        "pages": pages,
+        "links": len(results),
+        "broken_links": sum(1 for r in results if r["statusCode"] is None or r["statusCode"] >= 400),
+        "pages_per_sec": round(pages / crawl_seconds, 2),
+        "links_per_sec": round(len(results) / crawl_seconds, 2),
+    }
+    if args.db:
+        run["db_insert_seconds"] = round(await insert_and_roll_back(results), 3)
+    return run
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    fixture_site.add_site_arguments(parser)
+    parser.add_argument("--depth", type=int, default=3, help="maxDepth for the crawl")
+    parser.add_argument("--timeout", type=int, default=10)
+    parser.add_argument("--throttle", type=float, default=0, help="seconds to wait before each link request")
+    parser.add_argument("--processes", type=int, default=1, help="crawl with start_sharded_crawl when > 1")
+    parser.add_argument("--use-cache", action="store_true", help="go through the shared link status cache (needs Postgres)")
+    parser.add_argument("--db", action="store_true", help="also time the result insert (needs Postgres)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON here as well as to stdout")
+    args = parser.parse_args()
+
+    # Set before the crawler is imported so sharded crawl processes see it too
+    os.environ["LINK_THROTTLE_SECONDS"] = str(args.throttle)
+    os.environ.setdefault("CRAWL_MAX_PROCESSES", str(args.processes))
+
+    site = fixture_site.site_from_args(args)
+    server, base_url = fixture_site.start_in_subprocess(site)
+    try:
+        runs = []
+        # The crawler logs every link; keep stdout for the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            for _ in range(args.repeat):
+                runs.append(await run_once(base_url, args))
+    finally:
+        server.terminate()
+        server.join()
+
+    rss_mb, children_rss_mb = peak_rss_mb()
+    medians = {
+        key: round(statistics.median(run[key] for run in runs), 3)
+        for key in runs[0]
+        if key.endswith("_seconds") or key.endswith("_per_sec")
+    }
+    report = {
+        "benchmark": "crawl",
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "site": site,
+        "expected_pages": fixture_site.count_reachable_pages(site, args.depth),
+        "crawl": {
+            "depth": args.depth,
+            "throttle": args.throttle,
+            "processes": args.processes,
+            "use_cache": args.use_cache,
+        },
+        "median": medians,
+        # Measured after the site process exits, so the children figure includes it
+        "peak_rss_mb": rss_mb,
+        "peak_child_rss_mb": children_rss_mb,
+        "runs": runs,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Cold-start cost of `import app` (what uvicorn does before the first request).
+
+Each sample runs in a fresh interpreter. The script exits non-zero if the
+median is over --budget-ms, or if any library that should only load on
+first use (report rendering, HTML parsing, the crawler's HTTP client) was
+imported along with the app:
+
+    python -m benchmarks.bench_import --repeat 5 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Loaded on first report / first crawl, never by `import app`
+LAZY_MODULES = ["openpyxl", "reportlab", "bs4", "aiohttp"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({"ms": elapsed * 1000, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def sample() -> dict:
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=backend_dir, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.repeat)]
+    median_ms = statistics.median(s["ms"] for s in samples)
+    loaded = sorted({module for s in samples for module in s["loaded"]})
+
+    print(json.dumps({
+        "benchmark": "import_app",
+        "python": sys.version.split()[0],
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(s["ms"] for s in samples), 1),
+        "budget_ms": args.budget_ms,
+        "eagerly_loaded": loaded,
+    }, indent=2))
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"import app took {median_ms:.0f}ms, budget is {args.budget_ms:.0f}ms")
+    if loaded:
+        failures.append(f"loaded at import time: {', '.join(loaded)}")
+    if failures:
+        sys.exit("❌ " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Synthetic website for crawler benchmarks. Everything is generated from the
+page number and a seed, so the same options always serve the same site.
+
+Page n links to its children n*fanout+1 .. n*fanout+fanout (a tree of
+`pages` pages), back to the home page, and to a set of leaf links:
+
+    /check/{n}-{i}        200, or 404/500/429 at the configured rates
+    /redirect/{n}/{hops}  a chain of 302s that ends on a 200
+    /files/{n}.bin        a large binary, on every `binary_every`th page
+    //{external host}/ext/{k}
+                          "external" links, served by the same process under
+                          another host name, drawn from a small shared pool
+    {page}?utm_source=fixture
+                          the same page again, on every `duplicate_every`th page
+
+Every response waits a log-normal delay around `latency_ms`.
+
+Run on its own to poke at it in a browser:
+
+    python -m benchmarks.fixture_site --port 8765 --pages 200
+"""
+import argparse
+import asyncio
+import math
+import multiprocessing
+import random
+import socket
+import time
+import zlib
+from typing import Dict
+
+from aiohttp import web
+
+DEFAULT_SITE = {
+    "pages": 500,
+    "fanout": 5,
+    "links_per_page": 10,
+    "external_per_page": 3,
+    "external_pool": 50,
+    "latency_ms": 20.0,
+    "latency_sigma": 0.5,
+    "error_rate": 0.05,
+    "rate_limit_rate": 0.02,
+    "binary_every": 25,
+    "binary_kb": 512,
+    "redirect_hops": 3,
+    "duplicate_every": 0,
+    "seed": 1,
+}
+
+# Same server, different netloc, so the crawler treats these links as external
+EXTERNAL_HOST = "localhost"
+
+
+def _rng(site: Dict, key: str) -> random.Random:
+    return random.Random(site["seed"] * 1_000_003 + zlib.crc32(key.encode()))
+
+
+def _page_path(n: int) -> str:
+    return "/" if n == 0 else f"/page/{n}"
+
+
+def render_page(site: Dict, n: int, port: int) -> str:
+    first_child = n * site["fanout"] + 1
+    children = range(first_child, min(first_child + site["fanout"], site["pages"]))
+    rng = _rng(site, f"page:{n}")
+
+    links = [_page_path(child) for child in children]
+    links.append("/")
+    links += [f"/check/{n}-{i}" for i in range(site["links_per_page"])]
+    if site["redirect_hops"]:
+        links.append(f"/redirect/{n}/{site['redirect_hops']}")
+    if site["binary_every"] and n % site["binary_every"] == 0:
+        links.append(f"/files/{n}.bin")
+    if site["duplicate_every"] and n % site["duplicate_every"] == 0:
+        links.append(f"{_page_path(n)}?utm_source=fixture")
+    links += [
+        f"http://{EXTERNAL_HOST}:{port}/ext/{rng.randrange(site['external_pool'])}"
+        for _ in range(site["external_per_page"])
+    ]
+
+    anchors = "\n".join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+    return (
+        f"<!doctype html><html><head><title>Page {n}</title>"
+        f'<link rel="stylesheet" href="/static/site.css"></head>'
+        f"<body><h1>Page {n}</h1><img src=\"/static/logo.png\"><ul>{anchors}</ul>"
+        f"<p>{'Lorem ipsum dolor sit amet. ' * 40}</p></body></html>"
+    )
+
+
+def create_app(site: Dict) -> web.Application:
+    site = {**DEFAULT_SITE, **site}
+    binary_cache: Dict[int, bytes] = {}
+
+    @web.middleware
+    async def latency(request, handler):
+        rng = _rng(site, "latency:" + request.path)
+        median = site["latency_ms"] / 1000
+        if median > 0:
+            await asyncio.sleep(rng.lognormvariate(math.log(median), site["latency_sigma"]))
+        return await handler(request)
+
+    async def page(request):
+        n = int(request.match_info.get("n", 0))
+        if n >= site["pages"]:
+            raise web.HTTPNotFound()
+        return web.Response(text=render_page(site, n, request.url.port), content_type="text/html")
+
+    async def check(request):
+        roll = _rng(site, "status:" + request.match_info["key"]).random()
+        if roll < site["rate_limit_rate"]:
+            return web.Response(status=429, text="slow down")
+        if roll < site["rate_limit_rate"] + site["error_rate"] / 2:
+            return web.Response(status=404, text="not found")
+        if roll < site["rate_limit_rate"] + site["error_rate"]:
+            return web.Response(status=500, text="error")
+        return web.Response(text="ok")
+
+    async def redirect(request):
+        n, hops = request.match_info["n"], int(request.match_info["hops"])
+        if hops <= 1:
+            raise web.HTTPFound(f"/check/{n}-redirected")
+        raise web.HTTPFound(f"/redirect/{n}/{hops - 1}")
+
+    async def binary(request):
+        size = site["binary_kb"] * 1024
+        if size not in binary_cache:
+            binary_cache[size] = random.Random(size).randbytes(size)
+        return web.Response(body=binary_cache[size], content_type="application/octet-stream")
+
+    async def static(request):
+        return web.Response(body=b"x" * 2048)
+
+    async def external(request):
+        return web.Response(text="external ok")
+
+    app = web.Application(middlewares=[latency])
+    app.router.add_get("/", page)
+    app.router.add_get("/page/{n:\\d+}", page)
+    app.router.add_get("/check/{key}", check)
+    app.router.add_get("/redirect/{n}/{hops:\\d+}", redirect)
+    app.router.add_get("/files/{n}.bin", binary)
+    app.router.add_get("/static/{name}", static)
+    app.router.add_get("/ext/{k}", external)
+    return app
+
+
+def count_reachable_pages(site: Dict, max_depth: int) -> int:
+    """Pages within max_depth clicks of the home page (what a full crawl should visit)."""
+    site = {**DEFAULT_SITE, **site}
+    level, seen = [0], 1
+    for _ in range(max_depth):
+        level = [
+            child for n in level
+            for child in range(n * site["fanout"] + 1, min(n * site["fanout"] + 1 + site["fanout"], site["pages"]))
+        ]
+        seen += len(level)
+    return seen
+
+
+def serve(site: Dict, port: int):
+    web.run_app(create_app(site), host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_in_subprocess(site: Dict, port: int = None, startup_timeout: float = 10):
+    """Serve the site from a separate process so it doesn't compete with the crawler's event loop."""
+    port = port or free_port()
+    process = multiprocessing.get_context("spawn").Process(target=serve, args=(site, port), daemon=True)
+    process.start()
+
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, f"http://127.0.0.1:{port}/"
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f"Fixture site did not start on port {port}")
+
+
+def add_site_arguments(parser: argparse.ArgumentParser):
+    for name, default in DEFAULT_SITE.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=default)
+
+
+def site_from_args(args) -> Dict:
+    return {name: getattr(args, name) for name in DEFAULT_SITE}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    add_site_arguments(parser)
+    args = parser.parse_args()
+    print(f"Serving {args.pages} pages on http://127.0.0.1:{args.port}/")
+    serve(site_from_args(args), args.port)
@@ -0,0 +1,190 @@
+"""
+Concurrent load on the auth, dashboard, history and config endpoints, with
+per-endpoint latency percentiles and throughput. Seed the database first
+with benchmarks.seed_load_data.
+
+    python -m benchmarks.load_test --concurrency 20 --duration 30
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --endpoints history_full,history_summary
+
+Without --url the app is driven in-process through the ASGI interface. No
+server or network is involved, and background workers are not started.
+With --url the requests go to a running server, e.g. one uvicorn worker,
+to find its ceiling. Run and scan IDs are picked at random from the
+database either way. Mutating endpoints (save, scan, delete) are left out.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from auth.utils import create_access_token
+from benchmarks.asgi_client import call
+from benchmarks.seed_load_data import LOAD_TEST_PASSWORD
+from db.connection import get_connection, CONNECT_SECONDS
+
+# name -> (method, path(ids) -> (path, query), body, relative weight)
+ENDPOINTS: Dict[str, Tuple[str, Callable, dict, int]] = {
+    "auth_me": ("GET", lambda ids: ("/auth/me", ""), None, 10),
+    "auth_login": ("POST", lambda ids: ("/auth/login", ""), "login", 1),
+    "dashboard_stats": ("GET", lambda ids: ("/dashboard/stats", ""), None, 10),
+    "history_recent": ("GET", lambda ids: ("/history/recent", ""), None, 10),
+    "history_all": ("GET", lambda ids: ("/history/all", f"page={random.randint(1, 20)}&page_size=25"), None, 10),
+    "history_full": ("GET", lambda ids: (f"/history/{random.choice(ids['runs'])}/full", "limit=100"), None, 10),
+    "history_summary": ("GET", lambda ids: (f"/history/{random.choice(ids['runs'])}/summary", ""), None, 5),
+    "history_diff": ("GET", lambda ids: (f"/history/{random.choice(ids['runs'])}/diff", "limit=100"), None, 5),
+    "config_list": ("GET", lambda ids: ("/config/", ""), None, 2),
+    "config_get": ("GET", lambda ids: (f"/config/{random.choice(ids['scans'])}", ""), None, 10),
+    "config_schedules": ("GET", lambda ids: ("/config/schedules", ""), None, 2),
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def connections_opened() -> int:
+    return sum(sum(counts) for counts, _ in CONNECT_SECONDS.values.values())
+
+
+async def load_ids() -> Dict[str, list]:
+    conn = await get_connection()
+    try:
+        runs = [r["runID"] for r in await conn.fetch('SELECT "runID" FROM scan_runs')]
+        scans = [r["scanID"] for r in await conn.fetch('SELECT "scanID" FROM scans')]
+        user = await conn.fetchrow(
+            "SELECT \"UserID\", email FROM users WHERE email LIKE '%@loadtest.example.com' ORDER BY \"UserID\" LIMIT 1"
+        )
+    finally:
+        await conn.close()
+    if not runs or not user:
+        raise SystemExit("No seeded data; run python -m benchmarks.seed_load_data first")
+    return {"runs": runs, "scans": scans, "user_id": user["UserID"], "email": user["email"]}
+
+
+def make_sender(base_url: str):
+    """Returns send(method, path, query, cookies, body) -> status, plus a cleanup coroutine."""
+    if not base_url:
+        from app import app
+
+        async def send(method, path, query, cookies, body):
+            status, _ = await call(app, method, path, cookies=cookies, body=body, query=query)
+            return status
+
+        async def close():
+            pass
+        return send, close
+
+    import aiohttp
+    session = aiohttp.ClientSession()
+
+    async def send(method, path, query, cookies, body):
+        url = base_url.rstrip("/") + path + (f"?{query}" if query else "")
+        async with session.request(method, url, cookies=cookies, json=body) as resp:
+            await resp.read()
+            return resp.status
+
+    return send, session.close
+
+
+async def run(args) -> dict:
+    ids = await load_ids()
+    names = [name.strip() for name in args.endpoints.split(",")] if args.endpoints else list(ENDPOINTS)
+    unknown = [name for name in names if name not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(unknown)}")
+    weights = [ENDPOINTS[name][3] for name in names]
+
+    cookies = {"access_token": create_access_token({"sub": str(ids["user_id"])})}
+    login_body = {"email": ids["email"], "password": LOAD_TEST_PASSWORD}
+    send, close = make_sender(args.url)
+
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    deadline = time.perf_counter() + (args.duration if args.requests is None else float("inf"))
+    remaining = args.requests
+
+    async def user():
+        nonlocal remaining
+        while time.perf_counter() < deadline and (remaining is None or remaining > 0):
+            if remaining is not None:
+                remaining -= 1
+            name = random.choices(names, weights)[0]
+            method, path_for, body, _ = ENDPOINTS[name]
+            path, query = path_for(ids)
+            started = time.perf_counter()
+            try:
+                status = await send(method, path, query, cookies, login_body if body == "login" else body)
+            except Exception:
+                status = None
+            latencies[name].append(time.perf_counter() - started)
+            if status is None or status >= 400:
+                errors[name] += 1
+
+    connects_before = connections_opened()
+    started = time.perf_counter()
+    try:
+        # Route handlers print as they go; keep stdout for the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    finally:
+        await close()
+    elapsed = time.perf_counter() - started
+    connects = connections_opened() - connects_before
+
+    def summarize(values: List[float], error_count: int) -> dict:
+        values = sorted(values)
+        return {
+            "requests": len(values),
+            "errors": error_count,
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 1) if values else None,
+            "p95_ms": round(percentile(values, 95) * 1000, 1) if values else None,
+            "p99_ms": round(percentile(values, 99) * 1000, 1) if values else None,
+            "max_ms": round(values[-1] * 1000, 1) if values else None,
+        }
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    report = {
+        "benchmark": "api_load",
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 2),
+        "seed_data": {"runs": len(ids["runs"]), "scans": len(ids["scans"])},
+        "overall": summarize(all_latencies, sum(errors.values())),
+        "endpoints": {name: summarize(latencies[name], errors[name]) for name in names if latencies[name]},
+    }
+    if not args.url:
+        # Only visible in-process: how many Postgres connections each request opened on average
+        report["db_connections_per_request"] = round(connects / max(len(all_latencies), 1), 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; default drives the app in-process")
+    parser.add_argument("--concurrency", type=int, default=20, help="simulated users sending requests back to back")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="stop after this many requests instead of --duration")
+    parser.add_argument("--endpoints", help=f"comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for endpoint and ID choice")
+    parser.add_argument("--output", help="write the JSON here as well as to stdout")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Fill a throwaway Postgres database with production-sized data for
+benchmarks.load_test. Rows are generated inside Postgres (generate_series),
+so millions of link results take minutes rather than hours.
+
+    DATABASE_URL=postgresql://postgres@127.0.0.1:5432/linksweep_load \\
+        python -m benchmarks.seed_load_data --scans 2000 --runs-per-scan 3 --links-per-run 500
+
+Migrations are applied first. Seeded users are loadtest-<n>@loadtest.example.com
+with the password "loadtest". Refuses to touch a database that already has
+scans unless --force is given.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from auth.utils import hash_password
+from core.diagnosis import DIAG_OK, DIAG_NOT_FOUND, DIAG_SERVER_ERROR, DIAG_LOAD_FAILED
+from db.connection import get_connection
+from db.linkresults import ensure_partitions, _month_start, _add_months
+from db.migrate import apply_migrations
+
+LOAD_TEST_PASSWORD = "loadtest"
+
+# Runs whose link results go in per INSERT; keeps each statement to a few seconds
+RUNS_PER_STATEMENT = 50
+
+
+async def seed(args):
+    await apply_migrations()
+    conn = await get_connection()
+    try:
+        if not args.force and await conn.fetchval("SELECT EXISTS (SELECT 1 FROM scans)"):
+            raise SystemExit("Database already has scans; use --force to seed it anyway")
+
+        started = time.perf_counter()
+        role_id = await conn.fetchval('SELECT "RoleID" FROM roles WHERE "RoleName" = \'User\'')
+        password = await hash_password(LOAD_TEST_PASSWORD)
+        await conn.execute("""
+            INSERT INTO users (email, username, password, "RoleID", "createdAt")
+            SELECT 'loadtest-' || n || '@loadtest.example.com', 'loadtest-' || n, $2, $3, NOW()
+            FROM generate_series(1, $1) n
+            ON CONFLICT (email) DO NOTHING
+        """, args.users, password, role_id)
+        user_ids = [r["UserID"] for r in await conn.fetch(
+            "SELECT \"UserID\" FROM users WHERE email LIKE '%@loadtest.example.com'"
+        )]
+
+        config = json.dumps({"maxDepth": 2, "timeout": 5, "excludePaths": []})
+        scan_ids = [r["scanID"] for r in await conn.fetch("""
+            INSERT INTO scans ("userID", "startURL", config, "createdAt", "modifiedAt")
+            SELECT ($2::int[])[1 + n % array_length($2::int[], 1)],
+                   'https://site-' || n || '.example.edu/', $3::json, NOW(), NOW()
+            FROM generate_series(1, $1) n
+            RETURNING "scanID"
+        """, args.scans, user_ids, config)]
+        print(f"👥 {len(user_ids)} users, {len(scan_ids)} scans")
+
+        # Runs spread over the last --days days; runIDs follow time order as they do in production
+        now = datetime.now().replace(microsecond=0)
+        oldest = now - timedelta(days=args.days)
+        run_ids = [r["runID"] for r in await conn.fetch("""
+            INSERT INTO scan_runs ("scanID", "totalLinks", "brokenLinks", "runStartedAt", "runEndedAt", "createdAt", "modifiedAt")
+            SELECT s, $3, 0, t, t + INTERVAL '10 minutes', t, t
+            FROM unnest($1::int[]) s
+            CROSS JOIN generate_series(1, $2) r
+            CROSS JOIN LATERAL (
+                SELECT $4::timestamp + (random() * $5) * INTERVAL '1 day' AS t
+            ) ts
+            ORDER BY t
+            RETURNING "runID"
+        """, scan_ids, args.runs_per_scan, args.links_per_run, oldest, float(args.days))]
+        print(f"🏃 {len(run_ids)} runs")
+
+        month = _month_start(oldest)
+        while month <= now.date():
+            await ensure_partitions(conn, months_ahead=0, start=datetime.combine(month, datetime.min.time()))
+            month = _add_months(month, 1)
+
+        # Each scan's site gets its own pages; links are drawn from them plus a shared external pool
+        await conn.execute("""
+            INSERT INTO link_urls ("url")
+            SELECT 'https://site-' || (n % $1) || '.example.edu/page/' || (n / $1) FROM generate_series(0, $2 - 1) n
+            UNION ALL
+            SELECT 'https://external-' || n || '.example.org/' FROM generate_series(0, $3 - 1) n
+            ON CONFLICT ("urlHash") DO NOTHING
+        """, args.scans, args.scans * args.pages_per_site, args.external_pool)
+        first_url = await conn.fetchval('SELECT MIN("urlID") FROM link_urls')
+        url_count = await conn.fetchval('SELECT COUNT(*) FROM link_urls')
+
+        for i in range(0, len(run_ids), RUNS_PER_STATEMENT):
+            batch = run_ids[i:i + RUNS_PER_STATEMENT]
+            await conn.execute(f"""
+                INSERT INTO link_checks (
+                    "runID", "scanID", "sourceID", "linkID", "status_code", "status_text",
+                    "isInternal", "redirectedToLogin", "diagnosisCode", "checkedAt"
+                )
+                SELECT r."runID", r."scanID",
+                       $3 + (r."scanID" * 7 + g / 20) % $4,
+                       $3 + (r."scanID" * 131 + g * 17) % $4,
+                       v.status, CASE WHEN v.status IS NULL THEN 'Timeout' WHEN v.status >= 400 THEN 'Error' ELSE 'OK' END,
+                       g % 3 <> 0, FALSE,
+                       CASE WHEN v.status IS NULL THEN {DIAG_LOAD_FAILED} WHEN v.status = 404 THEN {DIAG_NOT_FOUND}
+                            WHEN v.status >= 500 THEN {DIAG_SERVER_ERROR} ELSE {DIAG_OK} END,
+                       r."runStartedAt"
+                FROM scan_runs r
+                CROSS JOIN generate_series(1, $2) g
+                CROSS JOIN LATERAL (
+                    SELECT CASE
+                        WHEN (r."runID" + g) % 100 < 5 THEN 404
+                        WHEN (r."runID" + g) % 100 = 5 THEN 500
+                        WHEN (r."runID" + g) % 100 = 6 THEN NULL
+                        ELSE 200
+                    END::smallint AS status
+                ) v
+                WHERE r."runID" = ANY($1::int[])
+            """, batch, args.links_per_run, first_url, url_count)
+            done = min(i + RUNS_PER_STATEMENT, len(run_ids))
+            print(f"🔗 {done * args.links_per_run:,} link results ({done}/{len(run_ids)} runs)")
+
+        await conn.execute("""
+            UPDATE scan_runs r SET "brokenLinks" = b.broken
+            FROM (
+                SELECT "runID", COUNT(*) FILTER (WHERE "status_code" IS NULL OR "status_code" >= 400) AS broken
+                FROM link_checks WHERE "runID" = ANY($1::int[]) GROUP BY "runID"
+            ) b
+            WHERE r."runID" = b."runID"
+        """, run_ids)
+        await conn.execute("ANALYZE")
+        print(f"✅ Seeded in {time.perf_counter() - started:.1f}s")
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--scans", type=int, default=2000)
+    parser.add_argument("--runs-per-scan", type=int, default=3)
+    parser.add_argument("--links-per-run", type=int, default=500)
+    parser.add_argument("--pages-per-site", type=int, default=200)
+    parser.add_argument("--external-pool", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=90, help="spread runs over this many days")
+    parser.add_argument("--force", action="store_true")
+    asyncio.run(seed(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, HTTPException, Path, Depends
+from fastapi import APIRouter, HTTPException, Path, Depends, Query
 from db.connection import get_connection
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from core.save_config import save_config, update_config
 from auth.dependencies import get_current_user 
-from core.scan_runner import run_scan
+from core.scan_jobs import enqueue_scan, get_job
+from core.cleanup import request_scan_deletion
 import json
 
 router = APIRouter(
@@ -19,6 +20,7 @@ async def get_all_scan_configs():
         records = await conn.fetch("""
             SELECT "scanID", "userID", "startURL", config, "createdAt", "modifiedAt"
             FROM scans
+            WHERE "scanID" NOT IN (SELECT "scanID" FROM scan_deletions)
             ORDER BY "createdAt" DESC;
         """)
 
@@ -44,6 +46,21 @@ async def get_all_scan_configs():
     finally:
         await conn.close()
 
+@router.get("/schedules", summary="Get scheduled scans and their last run")
+async def get_scan_schedules():
+    conn = await get_connection()
+    try:
+        records = await conn.fetch("""
+            SELECT s."scanID", sc."startURL", s."cron", s."jitterSeconds", s."enabled", s."nextRunAt",
+                   s."runningSince", s."lastRunAt", s."lastRunID", s."lastStatus", s."lastError"
+            FROM scan_schedules s
+            JOIN scans sc ON sc."scanID" = s."scanID"
+            ORDER BY s."nextRunAt"
+        """)
+        return {"success": True, "data": [dict(record) for record in records]}
+    finally:
+        await conn.close()
+
 @router.get("/{scan_id}", summary="Get scan configuration by scanID")
 async def get_scan_config_by_id(scan_id: int = Path(..., description="Scan ID to fetch")):
     conn = await get_connection()
@@ -51,7 +68,8 @@ async def get_scan_config_by_id(scan_id: int = Path(..., description="Scan ID to
         record = await conn.fetchrow("""
             SELECT "scanID", "userID", "startURL", "config", "createdAt", "modifiedAt"
             FROM scans
-            WHERE "scanID" = $1;
+            WHERE "scanID" = $1
+              AND "scanID" NOT IN (SELECT "scanID" FROM scan_deletions);
         """, scan_id)
 
         if not record:
@@ -86,6 +104,8 @@ async def save_scan_config(
     try:
         scan_id = await save_config(userID=user["UserID"], config=request.config)
         return {"success": True, "scanID": scan_id}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error saving config: {e}")
         raise HTTPException(status_code=500, detail="Failed to save configuration")
@@ -105,56 +125,63 @@ async def update_scan_config(
     except HTTPException as http_exc:
         # Forward known errors (like 404 from update_config)
         raise http_exc
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error updating config: {e}")
         raise HTTPException(status_code=500, detail="Failed to update configuration")
 
-@router.delete("/{scan_id}", summary="Delete scan config and related data")
+@router.delete("/{scan_id}", summary="Delete scan config and related data", status_code=202)
 async def delete_scan_config(
     scan_id: int = Path(..., description="Scan ID to delete"),
     user: dict = Depends(get_current_user)
 ):
-    conn = await get_connection()
+    # Results are removed in batches by the cleanup worker; the scan is hidden right away
     try:
-        # Check and delete from linkResults
-        link_result_count = await conn.fetchval("""
-            SELECT COUNT(*) FROM linkResults WHERE "scanID" = $1
-        """, scan_id)
-        if link_result_count > 0:
-            await conn.execute("""
-                DELETE FROM linkResultsß WHERE "scanID" = $1
-            """, scan_id)
-
-        # Check and delete from scan_runs
-        scan_run_count = await conn.fetchval("""
-            SELECT COUNT(*) FROM "scan_runs" WHERE "scanID" = $1
-        """, scan_id)
-        if scan_run_count > 0:
-            await conn.execute("""
-                DELETE FROM "scan_runs" WHERE "scanID" = $1
-            """, scan_id)
-
-        # Always delete from scans (assuming this is the master record)
-        await conn.execute("""
-            DELETE FROM "scans" WHERE "scanID" = $1
-        """, scan_id)
-
-        return {"success": True, "message": f"Deleted scanID {scan_id} and related records if present."}
-
+        queued = await request_scan_deletion(scan_id, user["UserID"])
     except Exception as e:
         print(f"Error deleting scanID {scan_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete configuration and related data")
-    finally:
-        await conn.close()
 
-@router.post("/scan/{scan_id}")
+    if not queued:
+        raise HTTPException(status_code=404, detail=f"No configuration found for scanID {scan_id}")
+    return {"success": True, "message": f"Deletion of scanID {scan_id} and its runs has been queued."}
+
+@router.post("/scan/{scan_id}", status_code=202)
 async def start_scan(
     scan_id: int = Path(..., description="Scan ID to run scan for"),
     user: dict = Depends(get_current_user)
 ):
+    # Scan workers pick the job up; poll /config/jobs/{jobID} for the run
     try:
-        result = await run_scan(userID=user["UserID"], scanID=scan_id)
-        return {"success": True, "data": result}
+        job_id = await enqueue_scan(scan_id, user["UserID"])
+    except Exception as e:
+        print(f"Error queuing scan: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue scan: {str(e)}")
+
+    if job_id is None:
+        raise HTTPException(status_code=404, detail=f"No configuration found for scanID {scan_id}")
+    return {"success": True, "data": {"jobID": job_id, "scanID": scan_id, "status": "queued"}}
+
+@router.post("/scan/{scan_id}/recheck", summary="Recheck only the broken links of a previous run", status_code=202)
+async def start_recheck(
+    scan_id: int = Path(..., description="Scan ID to recheck"),
+    run_id: Optional[int] = Query(None, description="Run whose broken links are rechecked; default: the latest run"),
+    user: dict = Depends(get_current_user)
+):
+    try:
+        job_id = await enqueue_scan(scan_id, user["UserID"], mode="recheck", recheck_of=run_id)
     except Exception as e:
-        print(f"Error running scan: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to run scan: {str(e)}")
\ No newline at end of file
+        print(f"Error queuing recheck: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue recheck: {str(e)}")
+
+    if job_id is None:
+        raise HTTPException(status_code=404, detail=f"No configuration found for scanID {scan_id}")
+    return {"success": True, "data": {"jobID": job_id, "scanID": scan_id, "status": "queued"}}
+
+@router.get("/jobs/{job_id}", summary="Status of a queued or finished scan job")
+async def get_scan_job(job_id: int = Path(..., description="jobID returned when the scan was queued")):
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"No scan job {job_id}")
+    return {"success": True, "data": job}
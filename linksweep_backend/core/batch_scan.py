@@ -0,0 +1,153 @@
+"""
+Run many saved scans from the command line, without the web server:
+
+    python -m core.batch_scan 12 15 19
+    python -m core.batch_scan --all --concurrency 4 --max-broken-pct 2
+    python -m core.batch_scan --url-like '%.pace.edu%' --max-broken 0 --json
+
+Scans run through run_scan exactly as a queued job would: the run is
+stored, diffed, emailed and its reports are pre-built before the process
+exits. Requests from all scans share one budget (--max-connections,
+--per-host). Progress goes to stdout one line per scan; --verbose adds the
+crawler's per-link log.
+
+Exit codes: 0 all runs passed, 1 a run went over a broken-link threshold,
+2 a run failed.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+from dotenv import load_dotenv
+from db.connection import get_connection
+from core import request_limits, report_pool
+from core.reports import wait_for_report_warmups
+from core.scan_runner import run_scan
+
+load_dotenv()
+
+EXIT_OK = 0
+EXIT_THRESHOLD = 1
+EXIT_FAILED = 2
+
+async def select_scans(args) -> List[Dict]:
+    """Scans named on the command line or matched by --all / --user-id / --url-like, minus deleted ones."""
+    conditions = ['"scanID" NOT IN (SELECT "scanID" FROM scan_deletions)']
+    params = []
+    if args.scan_ids:
+        params.append(args.scan_ids)
+        conditions.append(f'"scanID" = ANY(${len(params)}::int[])')
+    if args.user_id is not None:
+        params.append(args.user_id)
+        conditions.append(f'"userID" = ${len(params)}')
+    if args.url_like:
+        params.append(args.url_like)
+        conditions.append(f'"startURL" LIKE ${len(params)}')
+
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch(f"""
+            SELECT "scanID", "userID", "startURL" FROM scans
+            WHERE {" AND ".join(conditions)}
+            ORDER BY "scanID"
+        """, *params)
+    finally:
+        await conn.close()
+
+    if args.scan_ids:
+        missing = set(args.scan_ids) - {row["scanID"] for row in rows}
+        for scan_id in sorted(missing):
+            args.out.write(f"⚠️ scanID {scan_id} not found or being deleted\n")
+    return [dict(row) for row in rows]
+
+def over_threshold(result: Dict, args) -> bool:
+    broken, total = result["brokenLinks"], result["totalLinks"]
+    if args.max_broken is not None and broken > args.max_broken:
+        return True
+    if args.max_broken_pct is not None and total and broken * 100 / total > args.max_broken_pct:
+        return True
+    return False
+
+async def run_batch(args) -> int:
+    out = args.out
+    scans = await select_scans(args)
+    if not scans:
+        out.write("No scans selected\n")
+        return EXIT_OK
+
+    request_limits.configure(args.max_connections, args.per_host)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    summary = []
+    out.write(f"🚀 Running {len(scans)} scans, {args.concurrency} at a time\n")
+    out.flush()
+
+    async def run_one(scan: Dict):
+        async with semaphore:
+            started = time.perf_counter()
+            out.write(f"▶️ scanID {scan['scanID']} {scan['startURL']}\n")
+            out.flush()
+            entry = {"scanID": scan["scanID"], "startURL": scan["startURL"]}
+            try:
+                result = await run_scan(scan["userID"], scan["scanID"])
+                entry.update(result, status="over_threshold" if over_threshold(result, args) else "ok")
+                pct = result["brokenLinks"] * 100 / result["totalLinks"] if result["totalLinks"] else 0
+                mark = "❗" if entry["status"] == "over_threshold" else "✔️"
+                out.write(
+                    f"{mark} scanID {scan['scanID']} runID {result['runID']}: {result['brokenLinks']}/"
+                    f"{result['totalLinks']} broken ({pct:.1f}%) in {time.perf_counter() - started:.0f}s\n"
+                )
+            except Exception as e:
+                entry.update(status="failed", error=str(e))
+                out.write(f"✖️ scanID {scan['scanID']} failed: {e}\n")
+            out.flush()
+            summary.append(entry)
+
+    with contextlib.ExitStack() as stack:
+        # The crawler logs every link; only show that with --verbose
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        await asyncio.gather(*(run_one(scan) for scan in scans))
+        await wait_for_report_warmups()
+    report_pool.shutdown()
+
+    statuses = [entry["status"] for entry in summary]
+    out.write(
+        f"🏁 {statuses.count('ok')} ok, {statuses.count('over_threshold')} over threshold, "
+        f"{statuses.count('failed')} failed\n"
+    )
+    if args.json:
+        out.write(json.dumps(sorted(summary, key=lambda e: e["scanID"]), indent=2, default=str) + "\n")
+
+    if "failed" in statuses:
+        return EXIT_FAILED
+    if "over_threshold" in statuses:
+        return EXIT_THRESHOLD
+    return EXIT_OK
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scan_ids", nargs="*", type=int, help="scanIDs to run")
+    parser.add_argument("--all", action="store_true", help="every saved scan")
+    parser.add_argument("--user-id", type=int, help="only scans owned by this user")
+    parser.add_argument("--url-like", help="only scans whose startURL matches this SQL LIKE pattern")
+    parser.add_argument("--concurrency", type=int, default=4, help="scans running at once")
+    parser.add_argument("--max-connections", type=int, default=100, help="requests in flight across all scans")
+    parser.add_argument("--per-host", type=int, default=4, help="requests in flight to any one host")
+    parser.add_argument("--max-broken", type=int, help="fail a run with more broken links than this")
+    parser.add_argument("--max-broken-pct", type=float, help="fail a run with a higher share of broken links (0-100)")
+    parser.add_argument("--json", action="store_true", help="print a JSON summary of every run at the end")
+    parser.add_argument("--verbose", action="store_true", help="show the crawler's per-link log")
+    args = parser.parse_args()
+
+    if not (args.scan_ids or args.all or args.user_id is not None or args.url_like):
+        parser.error("name scanIDs or select scans with --all, --user-id or --url-like")
+    args.out = sys.stdout
+
+    sys.exit(asyncio.run(run_batch(args)))
+
+if __name__ == "__main__":
+    main()
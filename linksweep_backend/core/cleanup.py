@@ -0,0 +1,162 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from db.connection import get_connection
+from db.linkresults import ensure_partitions, drop_partitions_before
+from utils import report_cache
+
+load_dotenv()
+
+# Link results older than this are dropped a month-partition at a time; 0 keeps them forever
+LINK_RESULT_RETENTION_DAYS = int(os.getenv("LINK_RESULT_RETENTION_DAYS", "0"))
+
+# Rows removed per statement when deleting a scan, so no single DELETE holds locks for long
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "5000"))
+
+CLEANUP_POLL_SECONDS = float(os.getenv("CLEANUP_POLL_SECONDS", "60"))
+RETENTION_INTERVAL_SECONDS = 6 * 3600
+
+# Only one API worker runs cleanup at a time
+CLEANUP_LOCK_ID = 8_420_002
+
+# Set by request_scan_deletion so the worker in this process starts right away
+_wakeup = asyncio.Event()
+
+async def request_scan_deletion(scan_id: int, user_id: int = None) -> bool:
+    """Queue a scan and all of its runs for deletion. Returns False if the scan doesn't exist."""
+    conn = await get_connection()
+    try:
+        exists = await conn.fetchval('SELECT 1 FROM scans WHERE "scanID" = $1', scan_id)
+        if not exists:
+            return False
+        await conn.execute("""
+            INSERT INTO scan_deletions ("scanID", "requestedBy")
+            VALUES ($1, $2)
+            ON CONFLICT ("scanID") DO UPDATE
+            SET "status" = 'pending', "lastError" = NULL, "requestedAt" = NOW(), "finishedAt" = NULL
+        """, scan_id, user_id)
+    finally:
+        await conn.close()
+
+    _wakeup.set()
+    return True
+
+async def _delete_in_batches(conn, table: str, column: str, value) -> int:
+    deleted = 0
+    while True:
+        # The outer column check keeps ctid matches on other partitions out of the delete
+        result = await conn.execute(f"""
+            DELETE FROM {table}
+            WHERE "{column}" = $1 AND ctid IN (
+                SELECT ctid FROM {table} WHERE "{column}" = $1 LIMIT $2
+            )
+        """, value, DELETE_BATCH_SIZE)
+        count = int(result.split()[-1])
+        deleted += count
+        if count == 0:
+            return deleted
+        await asyncio.sleep(0)
+
+async def delete_scan(conn, scan_id: int) -> int:
+    """Remove a scan's results run by run in small batches, then its runs and the scan itself."""
+    run_ids = [row["runID"] for row in await conn.fetch(
+        'SELECT "runID" FROM scan_runs WHERE "scanID" = $1', scan_id
+    )]
+
+    deleted = 0
+    for run_id in run_ids:
+        deleted += await _delete_in_batches(conn, "link_checks", "runID", run_id)
+        deleted += await _delete_in_batches(conn, "linkresults_legacy", "runID", run_id)
+        await _delete_in_batches(conn, "run_diffs", "runID", run_id)
+        await conn.execute(
+            'UPDATE scan_deletions SET "deletedRows" = $2 WHERE "scanID" = $1', scan_id, deleted
+        )
+        report_cache.invalidate_run(run_id)
+
+    async with conn.transaction():
+        await conn.execute('DELETE FROM scan_runs WHERE "scanID" = $1', scan_id)
+        await conn.execute('DELETE FROM scans WHERE "scanID" = $1', scan_id)
+        await conn.execute("""
+            UPDATE scan_deletions SET "status" = 'done', "deletedRows" = $2, "finishedAt" = NOW()
+            WHERE "scanID" = $1
+        """, scan_id, deleted)
+    return deleted
+
+async def process_scan_deletions(conn) -> int:
+    pending = await conn.fetch("""
+        SELECT "scanID" FROM scan_deletions WHERE "status" = 'pending' ORDER BY "requestedAt"
+    """)
+    for row in pending:
+        scan_id = row["scanID"]
+        try:
+            deleted = await delete_scan(conn, scan_id)
+            print(f"🗑️ Deleted scanID {scan_id} ({deleted} link results)")
+        except Exception as e:
+            # Left pending; every step is safe to repeat on the next pass
+            print(f"Error deleting scanID {scan_id}: {e}")
+            await conn.execute(
+                'UPDATE scan_deletions SET "lastError" = $2 WHERE "scanID" = $1', scan_id, str(e)
+            )
+    return len(pending)
+
+async def apply_retention(conn):
+    if LINK_RESULT_RETENTION_DAYS <= 0:
+        return
+
+    # "checkedAt" holds naive New York time, like every run timestamp
+    cutoff = datetime.now(ZoneInfo("America/New_York")).replace(tzinfo=None) - timedelta(days=LINK_RESULT_RETENTION_DAYS)
+    for name in await drop_partitions_before(conn, cutoff):
+        print(f"🗑️ Dropped expired partition {name}")
+
+    # Rows from before partitioning still live in the legacy table
+    await _delete_older_than(conn, "linkresults_legacy", '"checkedAt" < $1', cutoff)
+    # Diffs only point at URLs, so they go with their run's age rather than a partition
+    await _delete_older_than(conn, "run_diffs", """
+        "runID" IN (SELECT "runID" FROM scan_runs WHERE "runEndedAt" < $1)
+    """, cutoff)
+
+async def _delete_older_than(conn, table: str, condition: str, cutoff: datetime):
+    while True:
+        result = await conn.execute(f"""
+            DELETE FROM {table}
+            WHERE ctid IN (SELECT ctid FROM {table} WHERE {condition} LIMIT $2)
+        """, cutoff, DELETE_BATCH_SIZE)
+        if result.endswith(" 0"):
+            return
+        await asyncio.sleep(0)
+
+async def run_cleanup_worker():
+    """Create upcoming partitions, carry out queued scan deletions and apply retention until cancelled."""
+    last_retention = None
+    while True:
+        _wakeup.clear()
+        try:
+            conn = await get_connection()
+            try:
+                if await conn.fetchval("SELECT pg_try_advisory_lock($1)", CLEANUP_LOCK_ID):
+                    try:
+                        for name in await ensure_partitions(conn):
+                            print(f"🗄️ Created partition {name}")
+                        await process_scan_deletions(conn)
+
+                        loop_time = asyncio.get_running_loop().time()
+                        if last_retention is None or loop_time - last_retention >= RETENTION_INTERVAL_SECONDS:
+                            await apply_retention(conn)
+                            # Expired link answers are never read again
+                            await _delete_older_than(
+                                conn, "link_status_cache", '"expiresAt" < $1', datetime.now(timezone.utc)
+                            )
+                            last_retention = loop_time
+                    finally:
+                        await conn.execute("SELECT pg_advisory_unlock($1)", CLEANUP_LOCK_ID)
+            finally:
+                await conn.close()
+        except Exception as e:
+            print(f"Cleanup worker error: {e}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=CLEANUP_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -1,11 +1,46 @@
-import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin
 from typing import List, Dict
 import ssl
+import os
+import time
+from core import link_cache, run_timings, request_limits
+from core.page_dedup import PageIndex, fingerprint
+from utils.metrics import Counter, status_class
+from core.diagnosis import (
+    DIAG_OK, DIAG_RATE_LIMITED, DIAG_FORBIDDEN, DIAG_UNAUTHORIZED, DIAG_LOGIN_REDIRECT,
+    DIAG_NOT_FOUND, DIAG_SERVER_ERROR, DIAG_NO_STATUS, DIAG_LOAD_FAILED,
+    diagnosis_text, fix_guide_text, diagnosis_code
+)
+
+# Pause before each link request during a crawl, to stay polite to the scanned site
+LINK_THROTTLE_SECONDS = float(os.getenv("LINK_THROTTLE_SECONDS", "1"))
+
+# Links requested at once by a recheck run, which has no page fetches to pace it
+RECHECK_CONCURRENCY = int(os.getenv("RECHECK_CONCURRENCY", "50"))
+
+REQUEST_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_4) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/114.0.5735.198 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5"
+}
+
+CRAWLER_REQUESTS = Counter(
+    "linksweep_crawler_requests_total", "Requests made by the crawler",
+    ["kind", "host_class", "status_class"]
+)
+
+_ssl_context = None
 
-visited_pages = set()
+def get_ssl_context():
+    # Loading the CA bundle is slow; build it once and share it across requests
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
 
 def is_internal(base_url, link_url):
     return urlparse(base_url).netloc == urlparse(link_url).netloc
@@ -24,165 +59,262 @@ def get_fix_guide(status_code, diagnosis):
     if diagnosis is None:
         return ""
 
-    if status_code == 429:
-        return "This page is blocking too many requests. Try scanning slower, or check it manually in a browser."
-    if status_code == 403:
-        return "Access is forbidden — the page might block bots or require permissions. Check it manually."
-    if status_code == 401:
-        return "Login is required to view this page. Try logging in and checking it directly."
-    if "Redirected to login" in diagnosis:
-        return "This page redirected to a login screen. Try opening it manually after logging in."
-    if status_code == 404:
-        return "The page doesn't exist. Consider removing or updating the link."
-    if status_code is None:
-        return "We couldn't check this link due to a technical error. Try again later or check manually."
-    if status_code >= 500:
-        return "The website has a server issue. Try again later or report it to the site owner."
-
-    return "No issues detected or no fix available."
+    return fix_guide_text(diagnosis_code(diagnosis))
+
+def classify_response(status, redirected_to_login) -> int:
+    if status == 429:
+        return DIAG_RATE_LIMITED
+    if status == 403:
+        return DIAG_FORBIDDEN
+    if status == 401:
+        return DIAG_UNAUTHORIZED
+    if redirected_to_login:
+        return DIAG_LOGIN_REDIRECT
+    if status == 404:
+        return DIAG_NOT_FOUND
+    if status is None:
+        return DIAG_NO_STATUS
+    if status >= 500:
+        return DIAG_SERVER_ERROR
+    return DIAG_OK
 
 
 async def fetch_page(session, url, timeout):
-    ssl_context = ssl.create_default_context()
+    ssl_context = get_ssl_context()
+    timings = run_timings.current()
+    timings.count("pageRequests")
     try:
-        async with session.get(url, timeout=timeout, ssl=ssl_context) as response:
-            content = await response.text()
-            return response.status, content
+        async with request_limits.slot(url):
+            with timings.phase("pageFetch"):
+                async with session.get(url, timeout=timeout, ssl=ssl_context) as response:
+                    body = await response.read()
+                    timings.count("bytesRead", len(body))
+                    content = await response.text()
+                    CRAWLER_REQUESTS.inc("page", "internal", status_class(response.status))
+                    return response.status, content
     except Exception:
+        CRAWLER_REQUESTS.inc("page", "internal", "error")
         return None, None
 
-async def check_link(session, source_page, link, timeout, base_url, exclude_paths, delay=1, retry_count=2):
+def cached_result(source_page, link, fields) -> Dict:
+    code = fields["diagnosisCode"]
+    return {
+        "sourcePage": source_page,
+        "link": link,
+        "statusCode": fields["statusCode"],
+        "statusText": fields["statusText"],
+        "linkType": "external",
+        "redirectedToLogin": fields["redirectedToLogin"],
+        "diagnosis": diagnosis_text(code),
+        "diagnosisCode": code,
+        "fixGuide": fix_guide_text(code)
+    }
+
+async def check_link(session, source_page, link, timeout, base_url, exclude_paths, delay=None, retry_count=2, use_cache=False):
     if should_exclude(link, exclude_paths):
         return None
 
-    await asyncio.sleep(delay)  # ⏱️ Throttle
+    # Only external links are shared between scans; the scanned site is always requested
+    use_cache = use_cache and not is_internal(base_url, link)
+    timings = run_timings.current()
+    if use_cache:
+        fields = link_cache.get(link)
+        if fields:
+            timings.count("cacheHits")
+            return cached_result(source_page, link, fields)
+        timings.count("cacheMisses")
+
+    with timings.phase("throttle"):
+        await asyncio.sleep(LINK_THROTTLE_SECONDS if delay is None else delay)  # ⏱️ Throttle
 
     diagnosis = ""
     redirected_to_login = False
 
-    ssl_context = ssl.create_default_context()
+    ssl_context = get_ssl_context()
+    host_class = "internal" if is_internal(base_url, link) else "external"
 
     for attempt in range(retry_count + 1):
+        timings.count("linkRequests")
+        request_started = None
         try:
-            async with session.get(link, timeout=timeout, ssl=ssl_context, allow_redirects=True) as resp:
-                final_url = str(resp.url).lower()
-                redirected_to_login = any(keyword in final_url for keyword in ["login", "signin", "auth"])
-
-                status = resp.status
-                diagnosis = None
-
-                if status == 429:
-                    diagnosis = "Too many requests – possibly rate-limited or bot-blocked."
-                elif status == 403:
-                    diagnosis = "Access forbidden – may be bot-protection or restricted page."
-                elif status == 401:
-                    diagnosis = "Unauthorized – login likely required."
-                elif redirected_to_login:
-                    diagnosis = "Redirected to login page – protected resource."
-                elif status == 404:
-                    diagnosis = "Not found – broken or moved link."
-                elif status >= 500:
-                    diagnosis = "Server error – issue on target site."
-                elif status is None:
-                    diagnosis = "Request failed – possible DNS, timeout, or connection error."
-
-
-                fix_guide = get_fix_guide(status, diagnosis)
-
-                result = {
-                    "sourcePage": source_page,
-                    "link": link,
-                    "statusCode": status,
-                    "statusText": resp.reason,
-                    "linkType": "internal" if is_internal(base_url, link) else "external",
-                    "redirectedToLogin": redirected_to_login,
-                    "diagnosis": diagnosis,
-                    "fixGuide": fix_guide
-                }
-
-                # ✅ Colored terminal output
-                if status is None or status >= 400:
-                    print(f'\033[91m❌ {link} ({status} {resp.reason}) -> {diagnosis or ""}\033[0m')
-                else:
-                    print(f'\033[92m✅ {link} ({status} {resp.reason})\033[0m')
-
-                return result
+            async with request_limits.slot(link):
+                request_started = time.perf_counter()
+                async with session.get(link, timeout=timeout, ssl=ssl_context, allow_redirects=True) as resp:
+                    timings.add("linkRequests", time.perf_counter() - request_started)
+                    final_url = str(resp.url).lower()
+                    redirected_to_login = any(keyword in final_url for keyword in ["login", "signin", "auth"])
+
+                    status = resp.status
+                    CRAWLER_REQUESTS.inc("link", host_class, status_class(status))
+                    code = classify_response(status, redirected_to_login)
+                    diagnosis = diagnosis_text(code)
+                    fix_guide = fix_guide_text(code)
+
+                    result = {
+                        "sourcePage": source_page,
+                        "link": link,
+                        "statusCode": status,
+                        "statusText": resp.reason,
+                        "linkType": "internal" if is_internal(base_url, link) else "external",
+                        "redirectedToLogin": redirected_to_login,
+                        "diagnosis": diagnosis,
+                        "diagnosisCode": code,
+                        "fixGuide": fix_guide
+                    }
+
+                    # ✅ Colored terminal output
+                    if status is None or status >= 400:
+                        print(f'\033[91m❌ {link} ({status} {resp.reason}) -> {diagnosis or ""}\033[0m')
+                    else:
+                        print(f'\033[92m✅ {link} ({status} {resp.reason})\033[0m')
+
+                    if use_cache:
+                        link_cache.put(link, result)
+                    return result
 
         except Exception as e:
+            if request_started is not None:
+                timings.add("linkRequests", time.perf_counter() - request_started)
+            CRAWLER_REQUESTS.inc("link", host_class, "error")
             if attempt == retry_count:
                 print(f'\033[91m❌ {link} (Error: {str(e)})\033[0m')
-                return {
+                result = {
                     "sourcePage": source_page,
                     "link": link,
                     "statusCode": None,
                     "statusText": str(e),
                     "linkType": "internal" if is_internal(base_url, link) else "external",
                     "redirectedToLogin": False,
-                    "diagnosis": "Failed to load – possible DNS, timeout, or firewall issue.",
-                    "fixGuide": ""
+                    "diagnosis": diagnosis_text(DIAG_LOAD_FAILED),
+                    "diagnosisCode": DIAG_LOAD_FAILED,
+                    "fixGuide": fix_guide_text(DIAG_LOAD_FAILED)
                 }
+                if use_cache:
+                    link_cache.put(link, result)
+                return result
 
         # 📈 Backoff retry
-        await asyncio.sleep(2 ** attempt)
-
-async def crawl_page(session, url, base_url, depth, max_depth, timeout, exclude_paths):
+        timings.count("retries")
+        with timings.phase("retryBackoff"):
+            await asyncio.sleep(2 ** attempt)
+
+async def process_page(session, url, base_url, timeout, exclude_paths, use_cache=False, pages=None):
+    """
+    Fetch one page and check every link on it. Returns (results, internal links to crawl next).
+    With a PageIndex, a page whose content was already parsed reuses the links found
+    there, resolved against this URL, and only requests the ones that resolve differently.
+    """
+    status, html = await fetch_page(session, url, timeout)
+    if not html:
+        return [], []
+
+    timings = run_timings.current()
+    known = None
+    if pages is not None:
+        content_key = fingerprint(html)
+        known = pages.lookup(content_key, url)
+
+    if known is not None:
+        timings.count("duplicatePages")
+        raw_links, raw_anchors, checked = known
+    else:
+        timings.count("pages")
+        with timings.phase("parseCpu", clock=time.thread_time):
+            from bs4 import BeautifulSoup  # loaded on the first crawled page, not at API startup
+            soup = BeautifulSoup(html, 'html.parser')
+            tags = soup.find_all(['a', 'img', 'script', 'link'])
+            raw_links = [tag.get('href' if tag.name in ['a', 'link'] else 'src') for tag in tags]
+            raw_links = [link for link in raw_links if link]
+            raw_anchors = [tag.get('href') for tag in soup.find_all('a', href=True)]
+        checked = {}
+
+    # Resolved here rather than stored: "#top", "?page=2" and "" depend on the page's own URL
+    page_links = list(dict.fromkeys(urljoin(url, link) for link in raw_links))
+    internal_links = [link for link in (urljoin(url, href) for href in raw_anchors) if is_internal(base_url, link)]
+    to_check = [link for link in page_links if link not in checked]
+
+    if use_cache and to_check:
+        with timings.phase("linkCache"):
+            await _cache_io(link_cache.prefetch([link for link in to_check if not is_internal(base_url, link)]))
+
+    answers = await asyncio.gather(*(
+        check_link(session, url, link, timeout, base_url, exclude_paths, use_cache=use_cache)
+        for link in to_check
+    ))
+
+    if use_cache and to_check:
+        with timings.phase("linkCache"):
+            await _cache_io(link_cache.flush())
+
+    checked = {**checked, **dict(zip(to_check, answers))}
+    if pages is not None and known is None:
+        pages.store(content_key, raw_links, raw_anchors, checked)
+
+    page_results = [checked[link] for link in page_links if checked[link]]
+    return [res if res["sourcePage"] == url else dict(res, sourcePage=url) for res in page_results], internal_links
+
+async def crawl_page(session, url, base_url, depth, max_depth, timeout, exclude_paths, use_cache=False, visited_pages=None, pages=None):
     results = []
+    if visited_pages is None:
+        visited_pages = set()
 
     if depth > max_depth or url in visited_pages or should_exclude(url, exclude_paths):
         return results
 
     visited_pages.add(url)
 
-    status, html = await fetch_page(session, url, timeout)
-    if not html:
-        return results
-
-    soup = BeautifulSoup(html, 'html.parser')
-    tags = soup.find_all(['a', 'img', 'script', 'link'])
-
-    link_tasks = []
-    found_links = set()
-
-    for tag in tags:
-        attr = 'href' if tag.name in ['a', 'link'] else 'src'
-        link = tag.get(attr)
-        if link:
-            full_link = urljoin(url, link)
-            if full_link not in found_links:
-                found_links.add(full_link)
-                link_tasks.append(
-                    check_link(session, url, full_link, timeout, base_url, exclude_paths)
-                )
-
-    page_results = await asyncio.gather(*link_tasks)
-    results.extend([res for res in page_results if res])
+    page_results, internal_links = await process_page(session, url, base_url, timeout, exclude_paths, use_cache, pages)
+    results.extend(page_results)
 
     # Recursive crawl on internal links
-    internal_links = [
-        urljoin(url, tag.get('href'))
-        for tag in soup.find_all('a', href=True)
-        if is_internal(base_url, urljoin(url, tag.get('href')))
-    ]
-
     for link in internal_links:
         results.extend(
-            await crawl_page(session, link, base_url, depth + 1, max_depth, timeout, exclude_paths)
+            await crawl_page(session, link, base_url, depth + 1, max_depth, timeout, exclude_paths, use_cache, visited_pages, pages)
         )
 
     return results
 
-async def start_crawl(start_url: str, max_depth: int, timeout: int, exclude_paths: List[str]) -> List[Dict]:
-    global visited_pages
-    visited_pages = set()
+async def _cache_io(operation):
+    # The crawl carries on without the shared cache if Postgres is unavailable
+    try:
+        await operation
+    except Exception as e:
+        print(f"Link cache error: {e}")
 
-    headers = {
-    "User-Agent": (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_4) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/114.0.5735.198 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Accept-Language": "en-US,en;q=0.5"
-}
+async def start_crawl(start_url: str, max_depth: int, timeout: int, exclude_paths: List[str], use_cache: bool = True,
+                      pages: PageIndex = None) -> List[Dict]:
+    """Pass a PageIndex to read the run's duplicate-content clusters afterwards."""
+    # Per crawl, so scans running side by side in one worker don't share it
+    import aiohttp
 
-    async with aiohttp.ClientSession(headers=headers) as session:
-        return await crawl_page(session, start_url, start_url, 0, max_depth, timeout, exclude_paths)
\ No newline at end of file
+    visited_pages = set()
+    if pages is None:
+        pages = PageIndex()
+
+    async with aiohttp.ClientSession(headers=REQUEST_HEADERS) as session:
+        return await crawl_page(session, start_url, start_url, 0, max_depth, timeout, exclude_paths, use_cache, visited_pages, pages)
+
+async def recheck_links(rows: List[Dict], base_url: str, timeout: int, concurrency: int = RECHECK_CONCURRENCY) -> List[Dict]:
+    """
+    Check earlier results again without crawling. Each unique link is
+    requested once and its result copied to every page it was found on.
+    rows: dicts with "sourcePage" and "link".
+    """
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(session, link):
+        async with semaphore:
+            return await check_link(session, None, link, timeout, base_url, [], delay=0)
+
+    unique_links = list(dict.fromkeys(row["link"] for row in rows))
+    async with aiohttp.ClientSession(headers=REQUEST_HEADERS) as session:
+        checked = await asyncio.gather(*(check(session, link) for link in unique_links))
+    by_link = dict(zip(unique_links, checked))
+
+    return [
+        dict(by_link[row["link"]], sourcePage=row["sourcePage"])
+        for row in rows
+        if by_link[row["link"]]
+    ]
\ No newline at end of file
@@ -0,0 +1,70 @@
+# Diagnosis and fix-guide text for checked links. Results store only the
+# integer code; the text lives here and is mirrored into link_diagnoses so
+# SQL views can join it back in.
+
+DIAG_OK = 0
+DIAG_RATE_LIMITED = 1
+DIAG_FORBIDDEN = 2
+DIAG_UNAUTHORIZED = 3
+DIAG_LOGIN_REDIRECT = 4
+DIAG_NOT_FOUND = 5
+DIAG_SERVER_ERROR = 6
+DIAG_NO_STATUS = 7
+DIAG_LOAD_FAILED = 8
+
+# code -> (diagnosis, fixGuide)
+DIAGNOSES = {
+    DIAG_OK: (None, ""),
+    DIAG_RATE_LIMITED: (
+        "Too many requests – possibly rate-limited or bot-blocked.",
+        "This page is blocking too many requests. Try scanning slower, or check it manually in a browser."
+    ),
+    DIAG_FORBIDDEN: (
+        "Access forbidden – may be bot-protection or restricted page.",
+        "Access is forbidden — the page might block bots or require permissions. Check it manually."
+    ),
+    DIAG_UNAUTHORIZED: (
+        "Unauthorized – login likely required.",
+        "Login is required to view this page. Try logging in and checking it directly."
+    ),
+    DIAG_LOGIN_REDIRECT: (
+        "Redirected to login page – protected resource.",
+        "This page redirected to a login screen. Try opening it manually after logging in."
+    ),
+    DIAG_NOT_FOUND: (
+        "Not found – broken or moved link.",
+        "The page doesn't exist. Consider removing or updating the link."
+    ),
+    DIAG_SERVER_ERROR: (
+        "Server error – issue on target site.",
+        "The website has a server issue. Try again later or report it to the site owner."
+    ),
+    DIAG_NO_STATUS: (
+        "Request failed – possible DNS, timeout, or connection error.",
+        "We couldn't check this link due to a technical error. Try again later or check manually."
+    ),
+    DIAG_LOAD_FAILED: (
+        "Failed to load – possible DNS, timeout, or firewall issue.",
+        ""
+    ),
+}
+
+_CODES_BY_TEXT = {diagnosis: code for code, (diagnosis, _) in DIAGNOSES.items()}
+
+def diagnosis_text(code: int):
+    return DIAGNOSES[code][0]
+
+def fix_guide_text(code: int) -> str:
+    return DIAGNOSES[code][1]
+
+def diagnosis_code(diagnosis) -> int:
+    """Code for a diagnosis sentence; anything unrecognised is stored as OK."""
+    return _CODES_BY_TEXT.get(diagnosis or None, DIAG_OK)
+
+async def sync_diagnosis_table(conn):
+    await conn.executemany("""
+        INSERT INTO link_diagnoses ("diagnosisCode", "diagnosis", "fixGuide")
+        VALUES ($1, $2, $3)
+        ON CONFLICT ("diagnosisCode") DO UPDATE
+        SET "diagnosis" = EXCLUDED."diagnosis", "fixGuide" = EXCLUDED."fixGuide"
+    """, [(code, diagnosis, fix_guide) for code, (diagnosis, fix_guide) in DIAGNOSES.items()])
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from db.connection import get_connection
+from utils import metrics
+from dotenv import load_dotenv
+import hashlib
+import os
+import time
+import uuid
+
+load_dotenv()
+
+# Seconds a cached answer for an external link stays valid, by outcome
+LINK_CACHE_TTL_OK = int(os.getenv("LINK_CACHE_TTL_OK", str(24 * 3600)))               # 2xx / 3xx
+LINK_CACHE_TTL_NOT_FOUND = int(os.getenv("LINK_CACHE_TTL_NOT_FOUND", str(6 * 3600)))  # other 4xx
+LINK_CACHE_TTL_ERROR = int(os.getenv("LINK_CACHE_TTL_ERROR", "300"))                  # 429, 5xx, timeouts
+
+# In-process front for the Postgres table; 0 disables it
+LINK_CACHE_MEMORY_SIZE = int(os.getenv("LINK_CACHE_MEMORY_SIZE", "20000"))
+
+_memory: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+# Answers from the network waiting for the next flush()
+_pending: Dict[str, tuple] = {}
+
+cache_stats = {"hits": 0, "misses": 0, "stored": 0}
+
+def _collect():
+    yield "linksweep_link_cache_hits_total", "counter", "External link answers served from the cache", cache_stats["hits"]
+    yield "linksweep_link_cache_misses_total", "counter", "External links that had to be requested", cache_stats["misses"]
+    yield "linksweep_link_cache_stored_total", "counter", "Answers written to the shared cache", cache_stats["stored"]
+    yield "linksweep_link_cache_memory_entries", "gauge", "Entries in the in-process cache", len(_memory)
+
+metrics.register_collector(_collect)
+
+def ttl_for(status) -> int:
+    if status is None or status == 429 or status >= 500:
+        return LINK_CACHE_TTL_ERROR
+    if status >= 400:
+        return LINK_CACHE_TTL_NOT_FOUND
+    return LINK_CACHE_TTL_OK
+
+def url_hash(url: str) -> uuid.UUID:
+    return uuid.UUID(hashlib.md5(url.encode()).hexdigest())
+
+def _remember(url: str, ttl: float, entry: dict):
+    if LINK_CACHE_MEMORY_SIZE <= 0:
+        return
+    _memory[url] = (time.monotonic() + ttl, entry)
+    _memory.move_to_end(url)
+    while len(_memory) > LINK_CACHE_MEMORY_SIZE:
+        _memory.popitem(last=False)
+
+def get(url: str) -> Optional[dict]:
+    """Cached status fields for a link, or None if it has to be requested."""
+    entry = _memory.get(url)
+    if entry is not None:
+        expires_at, fields = entry
+        if time.monotonic() < expires_at:
+            _memory.move_to_end(url)
+            cache_stats["hits"] += 1
+            return fields
+        _memory.pop(url, None)
+
+    cache_stats["misses"] += 1
+    return None
+
+def put(url: str, result: dict):
+    """Record a network answer; it is written to Postgres on the next flush()."""
+    fields = {
+        "statusCode": result["statusCode"],
+        "statusText": result["statusText"],
+        "redirectedToLogin": result["redirectedToLogin"],
+        "diagnosisCode": result["diagnosisCode"],
+    }
+    ttl = ttl_for(result["statusCode"])
+    _remember(url, ttl, fields)
+    _pending[url] = (fields, ttl)
+
+async def prefetch(urls: List[str]):
+    """Load the Postgres entries for links not already in memory, in one query."""
+    missing = list({url for url in urls if url not in _memory})
+    if not missing:
+        return
+
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch("""
+            SELECT u."url", c."status_code", c."status_text", c."redirectedToLogin", c."diagnosisCode",
+                   EXTRACT(EPOCH FROM c."expiresAt" - NOW()) AS ttl
+            FROM unnest($1::text[]) AS u ("url")
+            JOIN link_status_cache c ON c."urlHash" = md5(u."url")::uuid
+            WHERE c."expiresAt" > NOW()
+        """, missing)
+    finally:
+        await conn.close()
+
+    for row in rows:
+        _remember(row["url"], float(row["ttl"]), {
+            "statusCode": row["status_code"],
+            "statusText": row["status_text"],
+            "redirectedToLogin": row["redirectedToLogin"],
+            "diagnosisCode": row["diagnosisCode"],
+        })
+
+async def flush():
+    """Write answers gathered since the last flush so other scans and workers can reuse them."""
+    if not _pending:
+        return
+    batch = list(_pending.items())
+    _pending.clear()
+
+    conn = await get_connection()
+    try:
+        await conn.executemany("""
+            INSERT INTO link_status_cache (
+                "urlHash", "status_code", "status_text", "redirectedToLogin", "diagnosisCode", "checkedAt", "expiresAt"
+            ) VALUES ($1, $2, $3, $4, $5, NOW(), NOW() + make_interval(secs => $6))
+            ON CONFLICT ("urlHash") DO UPDATE SET
+                "status_code" = EXCLUDED."status_code",
+                "status_text" = EXCLUDED."status_text",
+                "redirectedToLogin" = EXCLUDED."redirectedToLogin",
+                "diagnosisCode" = EXCLUDED."diagnosisCode",
+                "checkedAt" = EXCLUDED."checkedAt",
+                "expiresAt" = EXCLUDED."expiresAt"
+        """, sorted(
+            # executemany is one transaction: key order keeps workers flushing the same URLs from deadlocking
+            (url_hash(url), f["statusCode"], f["statusText"], f["redirectedToLogin"], f["diagnosisCode"], ttl)
+            for url, (f, ttl) in batch
+        ))
+    finally:
+        await conn.close()
+    cache_stats["stored"] += len(batch)
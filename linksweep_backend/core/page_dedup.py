@@ -0,0 +1,54 @@
+"""
+Pages that serve the same HTML under several URLs (print views, ?utm=
+variants, index.html next to /) are parsed once per crawl. Later copies
+resolve the first copy's raw hrefs against their own URL and reuse its
+answers for every link that comes out the same; links that resolve
+differently (relative paths, "#frag", "?query") are checked again. The
+copies are reported as duplicate-content clusters.
+
+The fingerprint hashes the body with comments dropped and whitespace
+collapsed. Content without any links (plain-text answers, blank pages) is
+still skipped but left out of the clusters.
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+_COMMENTS = re.compile(r"<!--.*?-->", re.S)
+_WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(html: str) -> str:
+    body = _WHITESPACE.sub(" ", _COMMENTS.sub("", html)).strip()
+    return hashlib.sha1(body.encode()).hexdigest()
+
+class PageIndex:
+    def __init__(self):
+        self.urls: Dict[str, List[str]] = {}
+        # key -> (raw link values, raw <a href> values, answers by resolved link) of the first copy
+        self.checked: Dict[str, Tuple[List[str], List[str], Dict[str, Optional[Dict]]]] = {}
+        self.linkless: Set[str] = set()
+
+    def lookup(self, key: str, url: str) -> Optional[Tuple[List[str], List[str], Dict[str, Optional[Dict]]]]:
+        """What the first copy of this content found, or None the first time it is seen."""
+        self.urls.setdefault(key, []).append(url)
+        return self.checked.get(key)
+
+    def store(self, key: str, raw_links: List[str], raw_anchors: List[str], answers: Dict[str, Optional[Dict]]):
+        self.checked.setdefault(key, (raw_links, raw_anchors, answers))
+        if not raw_links and not raw_anchors:
+            self.linkless.add(key)
+
+    def to_dict(self) -> Dict:
+        return {"urls": self.urls, "linkless": list(self.linkless)}
+
+    def merge(self, data: Dict):
+        """Add the pages another crawl process saw, so clusters span shards."""
+        for key, pages in data["urls"].items():
+            self.urls.setdefault(key, []).extend(pages)
+        self.linkless.update(data["linkless"])
+
+    def clusters(self) -> List[Dict]:
+        """Groups of URLs with identical content, largest first."""
+        groups = [pages for key, pages in self.urls.items() if len(pages) > 1 and key not in self.linkless]
+        groups.sort(key=lambda pages: (-len(pages), pages[0]))
+        return [{"pages": pages, "count": len(pages)} for pages in groups]
@@ -0,0 +1,110 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from utils import metrics
+
+# Report rendering is pure CPU (openpyxl / reportlab), so it runs in separate processes.
+# REPORT_WORKERS=0 renders in a thread of the API process instead (handy when debugging).
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+# Jobs allowed to wait for a free worker before new downloads get 429
+REPORT_QUEUE_LIMIT = int(os.getenv("REPORT_QUEUE_LIMIT", str(max(REPORT_WORKERS, 1) * 2)))
+DEFAULT_RETRY_AFTER_SECONDS = 10
+
+_executor: Optional[ProcessPoolExecutor] = None
+_in_flight = 0
+
+job_stats: Dict[str, float] = {
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+    "queueWaitTotal": 0.0,
+    "queueWaitMax": 0.0,
+    "renderTotal": 0.0,
+    "renderMax": 0.0,
+    "renderAvg": 0.0,  # moving average, used for Retry-After estimates
+}
+
+RENDER_SECONDS = metrics.Histogram("linksweep_report_render_seconds", "Report build time in the pool", ["kind"])
+QUEUE_WAIT_SECONDS = metrics.Histogram("linksweep_report_queue_wait_seconds", "Time a report job waited for a worker", ["kind"])
+
+def _collect():
+    yield "linksweep_report_jobs_in_flight", "gauge", "Report jobs running or queued", _in_flight
+    yield "linksweep_report_jobs_failed_total", "counter", "Report jobs that raised", job_stats["failed"]
+    yield "linksweep_report_jobs_rejected_total", "counter", "Report jobs refused with 429", job_stats["rejected"]
+
+metrics.register_collector(_collect)
+
+class ReportPoolBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Report workers are busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: don't fork a process that has a running event loop and open sockets
+        _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def capacity() -> int:
+    return max(REPORT_WORKERS, 1) + REPORT_QUEUE_LIMIT
+
+def in_flight() -> int:
+    return _in_flight
+
+def _retry_after() -> int:
+    avg = job_stats["renderAvg"] or DEFAULT_RETRY_AFTER_SECONDS
+    waves = max(_in_flight - max(REPORT_WORKERS, 1), 0) / max(REPORT_WORKERS, 1) + 1
+    return max(1, int(avg * waves + 0.5))
+
+def _record(queue_wait: float, render_time: float):
+    job_stats["completed"] += 1
+    job_stats["queueWaitTotal"] += queue_wait
+    job_stats["queueWaitMax"] = max(job_stats["queueWaitMax"], queue_wait)
+    job_stats["renderTotal"] += render_time
+    job_stats["renderMax"] = max(job_stats["renderMax"], render_time)
+    previous = job_stats["renderAvg"]
+    job_stats["renderAvg"] = render_time if not previous else previous * 0.8 + render_time * 0.2
+
+async def run_job(func, *args, admit: bool = True, label: str = "report", kind: str = "report"):
+    """
+    Run func(*args, submitted_at) in the report pool. func must return
+    the wall-clock time it started so queue wait can be measured.
+    With admit=True the job is refused with ReportPoolBusy when the
+    pool and its queue are full.
+    """
+    global _in_flight
+    if admit and _in_flight >= capacity():
+        job_stats["rejected"] += 1
+        raise ReportPoolBusy(_retry_after())
+
+    _in_flight += 1
+    submitted_at = time.time()
+    try:
+        if REPORT_WORKERS > 0:
+            loop = asyncio.get_running_loop()
+            started_at = await loop.run_in_executor(_get_executor(), func, *args, submitted_at)
+        else:
+            started_at = await asyncio.to_thread(func, *args, submitted_at)
+    except Exception:
+        job_stats["failed"] += 1
+        raise
+    finally:
+        _in_flight -= 1
+
+    queue_wait = max(started_at - submitted_at, 0.0)
+    render_time = time.time() - started_at
+    _record(queue_wait, render_time)
+    QUEUE_WAIT_SECONDS.observe(queue_wait, kind)
+    RENDER_SECONDS.observe(render_time, kind)
+    print(f"🧾 {label}: waited {queue_wait:.2f}s, rendered in {render_time:.2f}s")
+    return render_time
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
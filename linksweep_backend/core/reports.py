@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import time
+from db.connection import get_connection
+from db.linkresults import LinkResultFilters, iter_link_results, fetch_report_summary, run_exists
+from utils import report_cache
+from core import report_pool
+
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PDF_MEDIA_TYPE = "application/pdf"
+
+# Formats pre-built in the background when a run finishes
+REPORT_WARMUP_FORMATS = [fmt.strip() for fmt in os.getenv("REPORT_WARMUP_FORMATS", "xlsx").split(",") if fmt.strip()]
+
+# Keep references so background warm-ups aren't garbage collected mid-run
+_warmup_tasks = set()
+
+# openpyxl and reportlab are only imported where reports are rendered (the report pool)
+async def _build_excel(run_id: int, fileobj):
+    from utils.excel_generator import stream_excel_report
+    await stream_excel_report(iter_link_results(run_id), run_id, output=fileobj)
+
+async def _build_pdf(run_id: int, fileobj):
+    from utils.pdf_generator import stream_pdf_report
+    summary = await fetch_report_summary(run_id)
+    rows = iter_link_results(run_id, LinkResultFilters(broken_only=True))
+    await stream_pdf_report(rows, run_id, summary, start_url=summary["startURL"], output=fileobj)
+
+# format -> (cache variant, media type, builder)
+REPORT_FORMATS = {
+    "xlsx": ("all", EXCEL_MEDIA_TYPE, _build_excel),
+    "pdf": ("broken", PDF_MEDIA_TYPE, _build_pdf),
+}
+
+def render_report(run_id: int, fmt: str, path: str, submitted_at: float) -> float:
+    """Report pool entry point: render one report into `path` with its own event loop and DB connection."""
+    started_at = time.time()
+    builder = REPORT_FORMATS[fmt][2]
+
+    async def render():
+        # A report for a run that doesn't exist yet would be empty and cached under that runID for good
+        if not await run_exists(run_id):
+            raise ValueError(f"No scan run found for runID {run_id}")
+        with open(path, "wb") as fileobj:
+            await builder(run_id, fileobj)
+
+    asyncio.run(render())
+    return started_at
+
+async def get_report(run_id: int, fmt: str = "xlsx", admit: bool = True) -> str:
+    """
+    Path of the cached report for a finished run, rendering it in the
+    report pool on first use. Raises report_pool.ReportPoolBusy when
+    admit=True and the pool is saturated.
+    """
+    variant = REPORT_FORMATS[fmt][0]
+
+    async def build(path):
+        await report_pool.run_job(render_report, run_id, fmt, path, admit=admit, label=f"{fmt} report for runID {run_id}", kind=fmt)
+
+    return await report_cache.get_or_build(report_cache.cache_key(run_id, fmt, variant), build)
+
+async def _warm_reports(run_id: int):
+    try:
+        seconds = {}
+        for fmt in REPORT_WARMUP_FORMATS:
+            started = time.perf_counter()
+            await get_report(run_id, fmt, admit=False)
+            seconds[fmt] = round(time.perf_counter() - started, 3)
+        print(f"📦 Cached reports for runID {run_id}")
+        await _record_report_timings(run_id, seconds)
+    except Exception as e:
+        print(f"Failed to pre-generate reports for runID {run_id}: {e}")
+
+async def _record_report_timings(run_id: int, seconds: dict):
+    # Added to the run's timings after the fact; the run is already committed by now
+    conn = await get_connection()
+    try:
+        await conn.execute("""
+            UPDATE scan_runs SET "timings" = COALESCE("timings", '{}'::jsonb) || jsonb_build_object('reports', $2::jsonb)
+            WHERE "runID" = $1
+        """, run_id, json.dumps(seconds))
+    finally:
+        await conn.close()
+
+def schedule_report_warmup(run_id: int):
+    task = asyncio.create_task(_warm_reports(run_id))
+    _warmup_tasks.add(task)
+    task.add_done_callback(_warmup_tasks.discard)
+
+async def wait_for_report_warmups():
+    """For one-shot processes (core.batch_scan) that must not exit while reports are still being built."""
+    while _warmup_tasks:
+        await asyncio.gather(*list(_warmup_tasks), return_exceptions=True)
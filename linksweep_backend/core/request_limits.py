@@ -0,0 +1,156 @@
+"""
+Process-wide fetch scheduler shared by every crawl running in the process.
+
+At most FETCH_MAX_CONNECTIONS crawler requests are in flight at once, and
+at most FETCH_PER_HOST to any one host. The host count is shared, so two
+scans of the same site split that host's allowance instead of doubling it.
+When requests have to wait, freed slots are handed out by smooth weighted
+round-robin between runs, not in arrival order. A run that queues thousands
+of links therefore can't starve a small scan that only needs a few.
+
+run_scan / run_recheck call begin_run() so their requests are accounted to
+that run. Crawls outside a run share one default slot in the rotation.
+Sharded crawl processes each have their own scheduler, configured with an
+equal split of this one's limits (shard_limits).
+"""
+import asyncio
+import os
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from core import run_timings
+from utils import metrics
+
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "100"))
+# 0 turns the per-host limit off
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "10"))
+
+class RunShare:
+    """One run's place in the rotation; weight 2 gets twice the slots of weight 1 while both are waiting."""
+
+    def __init__(self, weight: float = 1):
+        self.weight = max(weight, 0.1)
+
+class _Waiting:
+    __slots__ = ("share", "current", "hosts")
+
+    def __init__(self, share: RunShare):
+        self.share = share
+        self.current = 0.0
+        # host -> queued futures, rotated so one run's hosts also take turns
+        self.hosts: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+class FetchScheduler:
+    def __init__(self, total: int, per_host: int):
+        self.total = total
+        self.per_host = per_host
+        self.in_flight = 0
+        self.host_in_flight: Dict[str, int] = defaultdict(int)
+        self.waiting: Dict[RunShare, _Waiting] = {}
+
+    def queued(self) -> int:
+        return sum(len(q) for entry in self.waiting.values() for q in entry.hosts.values())
+
+    def _host_free(self, host: str) -> bool:
+        return not self.per_host or self.host_in_flight[host] < self.per_host
+
+    def _ready_host(self, entry: _Waiting) -> Optional[str]:
+        """First host of this run with a live request and spare capacity; drops cancelled waiters on the way."""
+        for host in list(entry.hosts):
+            queue = entry.hosts[host]
+            while queue and queue[0].done():
+                queue.popleft()
+            if not queue:
+                del entry.hosts[host]
+            elif self._host_free(host):
+                return host
+        return None
+
+    def _dispatch(self):
+        while self.in_flight < self.total and self.waiting:
+            best: Optional[Tuple[_Waiting, str]] = None
+            total_weight = 0.0
+            for share, entry in list(self.waiting.items()):
+                host = self._ready_host(entry)
+                if not entry.hosts:
+                    del self.waiting[share]
+                    continue
+                if host is None:
+                    continue
+                entry.current += share.weight
+                total_weight += share.weight
+                if best is None or entry.current > best[0].current:
+                    best = (entry, host)
+            if best is None:
+                return
+
+            entry, host = best
+            entry.current -= total_weight
+            future = entry.hosts[host].popleft()
+            entry.hosts.move_to_end(host)
+            self.in_flight += 1
+            self.host_in_flight[host] += 1
+            future.set_result(None)
+
+    async def acquire(self, host: str, share: RunShare):
+        entry = self.waiting.get(share)
+        if entry is None:
+            entry = self.waiting[share] = _Waiting(share)
+        future = asyncio.get_running_loop().create_future()
+        entry.hosts.setdefault(host, deque()).append(future)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted just before the cancel landed: hand the slot back
+            if future.done() and not future.cancelled():
+                self.release(host)
+            raise
+
+    def release(self, host: str):
+        self.in_flight -= 1
+        self.host_in_flight[host] -= 1
+        if self.host_in_flight[host] <= 0:
+            del self.host_in_flight[host]
+        self._dispatch()
+
+_scheduler = FetchScheduler(FETCH_MAX_CONNECTIONS, FETCH_PER_HOST)
+_default_share = RunShare()
+_current_share: ContextVar = ContextVar("fetch_share", default=None)
+
+def configure(total: int, per_host: int):
+    """Replace the process-wide limits (e.g. from core.batch_scan's command line)."""
+    global _scheduler
+    _scheduler = FetchScheduler(total, per_host)
+
+def shard_limits(processes: int) -> Tuple[int, int]:
+    """(total, per_host) for each of `processes` crawl processes, so together they stay within this process's limits."""
+    per_host = _scheduler.per_host and max(1, _scheduler.per_host // processes)
+    return max(1, _scheduler.total // processes), per_host
+
+def begin_run(weight: float = 1) -> RunShare:
+    """Account this task's crawler requests (and its child tasks') to a new run."""
+    share = RunShare(weight)
+    _current_share.set(share)
+    return share
+
+@asynccontextmanager
+async def slot(url: str):
+    host = urlparse(url).netloc.lower()
+    scheduler = _scheduler
+    # Kept apart from the request's own time so a long queue doesn't read as a slow network
+    with run_timings.current().phase("fetchQueue"):
+        await scheduler.acquire(host, _current_share.get() or _default_share)
+    try:
+        yield
+    finally:
+        scheduler.release(host)
+
+def _collect():
+    yield "linksweep_fetch_in_flight", "gauge", "Crawler requests holding a fetch slot", _scheduler.in_flight
+    yield "linksweep_fetch_queued", "gauge", "Crawler requests waiting for a fetch slot", _scheduler.queued()
+    yield "linksweep_fetch_waiting_runs", "gauge", "Runs with requests waiting for a fetch slot", len(_scheduler.waiting)
+
+metrics.register_collector(_collect)
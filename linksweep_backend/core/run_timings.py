@@ -0,0 +1,64 @@
+"""
+Where a scan run's time went. run_scan / run_recheck call start() and every
+crawler step below them adds to the same RunTimings through a context
+variable, so scans running side by side in one worker keep separate numbers.
+The result is stored as scan_runs."timings".
+
+Seconds are cumulative over concurrent requests, so "linkRequests" or
+"throttle" can be larger than the run's wall time. "parseCpu" is CPU time of
+the crawling thread. "fetchQueue" is time spent waiting for a fetch slot
+(core/request_limits.py); request phases start once the slot is granted.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict
+
+class RunTimings:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.extra: Dict = {}
+
+    def add(self, phase: str, seconds: float):
+        self.seconds[phase] += seconds
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    @contextmanager
+    def phase(self, name: str, clock=time.perf_counter):
+        started = clock()
+        try:
+            yield
+        finally:
+            self.seconds[name] += clock() - started
+
+    def merge(self, data: Dict):
+        """Add another RunTimings.to_dict(), e.g. from a crawl process."""
+        for name, seconds in data.get("seconds", {}).items():
+            self.seconds[name] += seconds
+        for name, amount in data.get("counters", {}).items():
+            self.counters[name] += amount
+
+    def to_dict(self) -> Dict:
+        return {
+            "seconds": {name: round(value, 3) for name, value in sorted(self.seconds.items())},
+            "counters": dict(sorted(self.counters.items())),
+            **self.extra,
+        }
+
+_current: ContextVar = ContextVar("run_timings", default=None)
+
+# Collects numbers from crawls that aren't part of a run (benchmarks, ad-hoc calls)
+_unattached = RunTimings()
+
+def start() -> RunTimings:
+    timings = RunTimings()
+    _current.set(timings)
+    return timings
+
+def current() -> RunTimings:
+    timings = _current.get()
+    return _unattached if timings is None else timings
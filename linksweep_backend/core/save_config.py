@@ -1,7 +1,9 @@
 import json
 from datetime import datetime
 from typing import Dict
+from fastapi import HTTPException
 from db.connection import get_connection
+from core.scheduler import sync_schedule
 
 async def save_config(userID: int, config: Dict) -> int:
     conn = await get_connection()
@@ -14,7 +16,9 @@ async def save_config(userID: int, config: Dict) -> int:
         VALUES ($1, $2, $3, $4, $4)
         RETURNING "scanID";
         """
-        row = await conn.fetchrow(query, userID, startURL, json.dumps(config), timestamp)
+        async with conn.transaction():
+            row = await conn.fetchrow(query, userID, startURL, json.dumps(config), timestamp)
+            await sync_schedule(conn, row["scanID"], config)
         await conn.close()
         return row["scanID"]
     except Exception as e:
@@ -28,16 +32,19 @@ async def update_config(userID: int, scanID: int, config: Dict):
         timestamp = datetime.utcnow()
         startURL = config.get("startURL")
 
-        result = await conn.execute("""
-            UPDATE scans
-            SET "startURL" = $1,
-                config = $2,
-                "modifiedAt" = $3
-            WHERE "scanID" = $4 AND "userID" = $5
-        """, startURL, json.dumps(config), timestamp, scanID, userID)
+        async with conn.transaction():
+            result = await conn.execute("""
+                UPDATE scans
+                SET "startURL" = $1,
+                    config = $2,
+                    "modifiedAt" = $3
+                WHERE "scanID" = $4 AND "userID" = $5
+            """, startURL, json.dumps(config), timestamp, scanID, userID)
 
-        if result == "UPDATE 0":
-            raise HTTPException(status_code=404, detail="Configuration not found or not owned by user")
+            if result == "UPDATE 0":
+                raise HTTPException(status_code=404, detail="Configuration not found or not owned by user")
+
+            await sync_schedule(conn, scanID, config)
     finally:
         await conn.close()
 
@@ -0,0 +1,149 @@
+import os
+from typing import Optional
+from dotenv import load_dotenv
+from db.connection import get_connection
+
+load_dotenv()
+
+# How long a worker owns a job without a heartbeat before another worker may take it
+SCAN_JOB_LEASE_SECONDS = int(os.getenv("SCAN_JOB_LEASE_SECONDS", "120"))
+
+# Leases a job may lose (worker crashes) before it is marked failed
+SCAN_JOB_MAX_ATTEMPTS = int(os.getenv("SCAN_JOB_MAX_ATTEMPTS", "3"))
+
+# Workers LISTEN on this channel so a new job starts without waiting for the next poll
+SCAN_JOBS_CHANNEL = "scan_jobs"
+
+JOB_COLUMNS = """
+    "jobID", "scanID", "userID", "mode", "recheckOf", "scheduled", "status", "attempts",
+    "workerID", "runID", "lastError", "queuedAt", "startedAt", "finishedAt"
+"""
+
+class LeaseLost(Exception):
+    """The job was taken over by another worker after this one missed its heartbeats."""
+
+async def enqueue_scan(scan_id: int, user_id: int = None, mode: str = "full", recheck_of: int = None,
+                       scheduled: bool = False, conn=None) -> int:
+    """Queue a scan run for the workers. Returns its jobID, or None if the scan doesn't exist."""
+    own_conn = conn is None
+    if own_conn:
+        conn = await get_connection()
+    try:
+        job_id = await conn.fetchval("""
+            INSERT INTO scan_jobs ("scanID", "userID", "mode", "recheckOf", "scheduled")
+            SELECT "scanID", $2, $3, $4, $5 FROM scans
+            WHERE "scanID" = $1 AND "scanID" NOT IN (SELECT "scanID" FROM scan_deletions)
+            RETURNING "jobID"
+        """, scan_id, user_id, mode, recheck_of, scheduled)
+        if job_id is not None:
+            await conn.execute("SELECT pg_notify($1, $2)", SCAN_JOBS_CHANNEL, str(job_id))
+        return job_id
+    finally:
+        if own_conn:
+            await conn.close()
+
+async def get_job(job_id: int) -> Optional[dict]:
+    conn = await get_connection()
+    try:
+        row = await conn.fetchrow(f'SELECT {JOB_COLUMNS} FROM scan_jobs WHERE "jobID" = $1', job_id)
+        return dict(row) if row else None
+    finally:
+        await conn.close()
+
+async def _record_schedule_result(conn, job, status: str, run_id: int = None, error: str = None):
+    if not job["scheduled"]:
+        return
+    await conn.execute("""
+        UPDATE scan_schedules
+        SET "runningSince" = NULL, "lastRunAt" = NOW(), "lastRunID" = COALESCE($2, "lastRunID"),
+            "lastStatus" = $3, "lastError" = $4
+        WHERE "scanID" = $1
+    """, job["scanID"], run_id, status, error)
+
+async def fail_abandoned_jobs(conn):
+    """Give up on jobs whose lease has expired too many times."""
+    rows = await conn.fetch(f"""
+        UPDATE scan_jobs
+        SET "status" = 'failed', "finishedAt" = NOW(),
+            "lastError" = 'Worker lost the job ' || "attempts" || ' times'
+        WHERE "status" = 'running' AND "leaseExpiresAt" < NOW() AND "attempts" >= $1
+        RETURNING {JOB_COLUMNS}
+    """, SCAN_JOB_MAX_ATTEMPTS)
+    for row in rows:
+        await _record_schedule_result(conn, row, "failed", error=row["lastError"])
+
+async def claim_job(conn, worker_id: str) -> Optional[dict]:
+    """Lease the oldest queued job, or one whose worker stopped sending heartbeats."""
+    row = await conn.fetchrow(f"""
+        UPDATE scan_jobs
+        SET "status" = 'running', "workerID" = $1, "attempts" = "attempts" + 1,
+            "startedAt" = NOW(), "heartbeatAt" = NOW(),
+            "leaseExpiresAt" = NOW() + make_interval(secs => $2)
+        WHERE "jobID" = (
+            SELECT "jobID" FROM scan_jobs
+            WHERE "status" = 'queued'
+               OR ("status" = 'running' AND "leaseExpiresAt" < NOW() AND "attempts" < $3)
+            ORDER BY "queuedAt"
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {JOB_COLUMNS}
+    """, worker_id, SCAN_JOB_LEASE_SECONDS, SCAN_JOB_MAX_ATTEMPTS)
+    return dict(row) if row else None
+
+async def renew_lease(conn, job_id: int, worker_id: str) -> bool:
+    """Heartbeat. False means another worker has taken the job over."""
+    renewed = await conn.fetchval("""
+        UPDATE scan_jobs
+        SET "heartbeatAt" = NOW(), "leaseExpiresAt" = NOW() + make_interval(secs => $3)
+        WHERE "jobID" = $1 AND "workerID" = $2 AND "status" = 'running'
+        RETURNING 1
+    """, job_id, worker_id, SCAN_JOB_LEASE_SECONDS)
+    return bool(renewed)
+
+async def complete_job(conn, job: dict, worker_id: str, run_id: int):
+    """
+    Mark a job finished. Called inside the transaction that stores the run,
+    so a worker that lost its lease can't also commit a duplicate run.
+    """
+    owned = await conn.fetchval("""
+        SELECT 1 FROM scan_jobs
+        WHERE "jobID" = $1 AND "workerID" = $2 AND "status" = 'running'
+        FOR UPDATE
+    """, job["jobID"], worker_id)
+    if not owned:
+        raise LeaseLost(f"Job {job['jobID']} is no longer leased to {worker_id}")
+
+    await conn.execute("""
+        UPDATE scan_jobs SET "status" = 'finished', "runID" = $2, "finishedAt" = NOW(), "lastError" = NULL
+        WHERE "jobID" = $1
+    """, job["jobID"], run_id)
+    await _record_schedule_result(conn, job, "finished", run_id)
+
+async def fail_job(job: dict, worker_id: str, error: str):
+    conn = await get_connection()
+    try:
+        async with conn.transaction():
+            failed = await conn.fetchval("""
+                UPDATE scan_jobs SET "status" = 'failed', "lastError" = $3, "finishedAt" = NOW()
+                WHERE "jobID" = $1 AND "workerID" = $2 AND "status" = 'running'
+                RETURNING 1
+            """, job["jobID"], worker_id, error)
+            if failed:
+                await _record_schedule_result(conn, job, "failed", error=error)
+    finally:
+        await conn.close()
+
+async def release_job(job: dict, worker_id: str):
+    """Hand a job back to the queue when its worker shuts down mid-run."""
+    conn = await get_connection()
+    try:
+        await conn.execute("""
+            UPDATE scan_jobs
+            SET "status" = 'queued', "workerID" = NULL, "leaseExpiresAt" = NULL,
+                "attempts" = GREATEST("attempts" - 1, 0)
+            WHERE "jobID" = $1 AND "workerID" = $2 AND "status" = 'running'
+        """, job["jobID"], worker_id)
+        await conn.execute("SELECT pg_notify($1, $2)", SCAN_JOBS_CHANNEL, str(job["jobID"]))
+    finally:
+        await conn.close()
@@ -1,19 +1,58 @@
 import asyncio
+import functools
 from db.connection import get_connection
-from core.crawler import start_crawl
+from core.crawler import start_crawl, recheck_links
+from core.sharded_crawl import start_sharded_crawl
+from core.page_dedup import PageIndex
+from db.linkresults import insert_link_results, BROKEN_SQL
+from db.run_diffs import compute_run_diff
 from typing import Dict, List
 import json
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from utils.pdf_generator import generate_pdf_report
-from utils.excel_generator import generate_excel_report
-import os, time
+from core.reports import schedule_report_warmup
+from core import run_timings, request_limits
+from utils.profiler import SamplingProfiler
+from utils.metrics import Counter, Gauge
+from utils.email_sender import queue_email
+import time
 
-os.environ["TZ"] = "America/New_York"
-time.tzset()
+SCANS_ACTIVE = Gauge("linksweep_scans_active", "Scan runs in progress in this process", ["mode"])
+SCAN_RUNS = Counter("linksweep_scan_runs_total", "Finished scan runs", ["mode", "outcome"])
 
-async def run_scan(userID: int, scanID: int) -> Dict:
+def track_run(mode: str):
+    """Decorator keeping SCANS_ACTIVE / SCAN_RUNS up to date around a run function."""
+    def wrap(func):
+        @functools.wraps(func)
+        async def tracked(*args, **kwargs):
+            SCANS_ACTIVE.inc(mode)
+            outcome = "failed"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                SCANS_ACTIVE.dec(mode)
+                SCAN_RUNS.inc(mode, outcome)
+        return tracked
+    return wrap
+
+async def store_timings(conn, run_id: int, timings: run_timings.RunTimings, started: float):
+    timings.add("total", time.perf_counter() - started)
+    await conn.execute(
+        'UPDATE scan_runs SET "timings" = $2::jsonb WHERE "runID" = $1', run_id, json.dumps(timings.to_dict())
+    )
+
+@track_run("full")
+async def run_scan(userID: int, scanID: int, on_commit=None) -> Dict:
+    """
+    Crawl a saved scan and store the run. `on_commit(conn, runID)` is awaited
+    inside the transaction that stores it; raising there discards the run.
+    """
     conn = await get_connection()
+    timings = run_timings.start()
+    profiler = None
+    started = time.perf_counter()
 
     #Use New York timezone
     runStartedAt = datetime.now(ZoneInfo("America/New_York"))
@@ -22,7 +61,10 @@ async def run_scan(userID: int, scanID: int) -> Dict:
     try:
         print(f"Loading config for scanID: {scanID}")
         row = await conn.fetchrow(
-            'SELECT "config", "startURL" FROM scans WHERE "scanID" = $1',
+            '''
+            SELECT "config", "startURL" FROM scans
+            WHERE "scanID" = $1 AND "scanID" NOT IN (SELECT "scanID" FROM scan_deletions)
+            ''',
             scanID
         )
         if not row:
@@ -47,9 +89,27 @@ async def run_scan(userID: int, scanID: int) -> Dict:
         print(f"StartURL: {startURL}, Max Depth: {max_depth}, Timeout: {timeout}, Exclude Paths: {excludePaths}")
         print(f"Run Started At: ", runStartedAt)
 
-        results = await start_crawl(startURL, max_depth, timeout, excludePaths)
+        # "profile": true records a sampling profile of this run (utils/profiler.py)
+        if config.get("profile"):
+            profiler = SamplingProfiler().start()
+
+        # Scans that must see live answers for external links set "useLinkCache": false
+        use_cache = config.get("useLinkCache", True)
+        # Very large sites can spread the crawl over several processes with "crawlProcesses": N
+        processes = int(config.get("crawlProcesses", 1) or 1)
+        # Share of the process-wide fetch budget while other scans are running (core/request_limits.py)
+        request_limits.begin_run(float(config.get("fetchWeight", 1) or 1))
+        pages = PageIndex()
+        with timings.phase("crawl"):
+            if processes > 1:
+                results = await start_sharded_crawl(startURL, max_depth, timeout, excludePaths, use_cache, processes, pages)
+            else:
+                results = await start_crawl(startURL, max_depth, timeout, excludePaths, use_cache, pages)
+        duplicate_pages = pages.clusters()
        
         print(f"Crawl finished. Total links found: {len(results)}")
+        if duplicate_pages:
+            print(f"♻️ {len(duplicate_pages)} groups of pages with identical content")
         print(f"Run Started At: ", runStartedAt)
 
         runEndedAt = datetime.now(ZoneInfo("America/New_York"))
@@ -60,64 +120,202 @@ async def run_scan(userID: int, scanID: int) -> Dict:
         total_links = len(results)
         broken_links = len([r for r in results if r['statusCode'] is None or r['statusCode'] >= 400])
 
-        # Insert into scan_runs
-        run_row = await conn.fetchrow("""
-            INSERT INTO scan_runs (
-                "scanID", "totalLinks", "brokenLinks",
-                "runStartedAt", "runEndedAt", "createdAt", "modifiedAt"
-            ) VALUES ($1, $2, $3, $4, $5, $6, $6)
-            RETURNING "runID";
-        """, scanID, total_links, broken_links, runStartedAt_naive, runEndedAt_naive, runEndedAt_naive)
-
-        runID = run_row["runID"]
-
-        # Insert linkresults
-        insert_link_query = """
-        INSERT INTO linkresults (
-            "runID", "scanID", "source_page", "link", "status_code",
-            "status_text", "link_type", "checkedAt", "modifiedAt", "diagnosis", "redirectedToLogin", "fixGuide"
-        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $8, $9, $10, $11);
-        """
-
-        for result in results:
-            status_code = result["statusCode"]
-            link = result["link"]
-            text = result["statusText"]
-
-            # Terminal output (Colored)
-            if status_code is None or status_code >= 400:
-                print(f'\033[91m{link} ({status_code} {text})\033[0m')
-            else:
-                print(f'\033[92m{link} ({status_code} {text})\033[0m')
-
-            await conn.execute(
-                insert_link_query,
-                runID,
-                scanID,
-                result["sourcePage"],
-                link,
-                status_code,
-                text,
-                result["linkType"],
-                runEndedAt_naive,
-                result.get("diagnosis", ""),
-                result.get("redirectedToLogin", False),
-                result.get("fixGuide", ""),
-            )
+        # The run row and its results become visible together
+        async with conn.transaction():
+            # Insert into scan_runs
+            run_row = await conn.fetchrow("""
+                INSERT INTO scan_runs (
+                    "scanID", "totalLinks", "brokenLinks",
+                    "runStartedAt", "runEndedAt", "createdAt", "modifiedAt", "duplicatePages"
+                ) VALUES ($1, $2, $3, $4, $5, $6, $6, $7::jsonb)
+                RETURNING "runID";
+            """, scanID, total_links, broken_links, runStartedAt_naive, runEndedAt_naive, runEndedAt_naive,
+                json.dumps(duplicate_pages))
 
-        #Generate PDF
-        generate_excel_report(scanID, results)
+            runID = run_row["runID"]
 
-        await conn.close()
+            # Insert linkresults (URLs interned, rows bulk-copied)
+            with timings.phase("dbInsert"):
+                await insert_link_results(conn, runID, scanID, results, runEndedAt_naive)
+
+            # What changed since the previous run of this scan
+            with timings.phase("diff"):
+                diff_counts = await compute_run_diff(conn, runID, scanID)
+
+            if config.get("notifyOnFinish", True):
+                await queue_scan_finished_email(conn, scanID, runID, startURL, total_links, broken_links)
+
+            if profiler:
+                profiler.stop()
+            await store_timings(conn, runID, timings, started)
+
+            if on_commit:
+                await on_commit(conn, runID)
+
+        if profiler:
+            # File I/O off the event loop, and after the run's transaction has committed
+            profile_path = await asyncio.to_thread(profiler.write, f"run-{runID}")
+            await conn.execute("""
+                UPDATE scan_runs SET "timings" = COALESCE("timings", '{}'::jsonb) || jsonb_build_object('profile', $2::text)
+                WHERE "runID" = $1
+            """, runID, profile_path)
+
+        # Pre-build the report so the first download is a file read
+        schedule_report_warmup(runID)
 
         return {
             "scanID": scanID,
             "runID": runID,
             "totalLinks": total_links,
-            "brokenLinks": broken_links
+            "brokenLinks": broken_links,
+            "changes": diff_counts,
+            "duplicatePages": sum(cluster["count"] - 1 for cluster in duplicate_pages)
         }
 
     except Exception as e:
-        await conn.close()
         print(f"Error during scan: {e}")
-        raise e
\ No newline at end of file
+        raise e
+    finally:
+        # Also on cancellation (lease lost, worker shutdown), which isn't an Exception
+        if profiler:
+            profiler.stop()
+        await conn.close()
+
+@track_run("recheck")
+async def run_recheck(userID: int, scanID: int, runID: int = None, on_commit=None) -> Dict:
+    """
+    Request only the links that were broken in an earlier run of the scan
+    (its latest run by default) and store the answers as a new run that
+    points back at that run. `on_commit` works as in run_scan.
+    """
+    conn = await get_connection()
+    timings = run_timings.start()
+    started = time.perf_counter()
+
+    runStartedAt = datetime.now(ZoneInfo("America/New_York"))
+    runStartedAt_naive = runStartedAt.replace(tzinfo=None)
+
+    try:
+        row = await conn.fetchrow(
+            '''
+            SELECT "config", "startURL" FROM scans
+            WHERE "scanID" = $1 AND "scanID" NOT IN (SELECT "scanID" FROM scan_deletions)
+            ''',
+            scanID
+        )
+        if not row:
+            raise ValueError("Invalid scanID or unauthorized access.")
+
+        config = row["config"]
+        if isinstance(config, str):
+            config = json.loads(config)
+        startURL = row["startURL"]
+        timeout = config.get("timeout", 5)
+        request_limits.begin_run(float(config.get("fetchWeight", 1) or 1))
+
+        if runID is None:
+            runID = await conn.fetchval(
+                'SELECT "runID" FROM scan_runs WHERE "scanID" = $1 ORDER BY "runID" DESC LIMIT 1', scanID
+            )
+        elif not await conn.fetchval(
+            'SELECT 1 FROM scan_runs WHERE "runID" = $1 AND "scanID" = $2', runID, scanID
+        ):
+            runID = None
+        if runID is None:
+            raise ValueError("No run of this scan to recheck.")
+
+        broken_rows = await conn.fetch(f'''
+            SELECT "source_page", "link" FROM linkresults
+            WHERE "runID" = $1 AND {BROKEN_SQL}
+        ''', runID)
+
+        print(f"🔁 Rechecking {len(broken_rows)} broken links from runID {runID}")
+        with timings.phase("crawl"):
+            results = await recheck_links(
+                [{"sourcePage": r["source_page"], "link": r["link"]} for r in broken_rows], startURL, timeout
+            )
+
+        runEndedAt_naive = datetime.now(ZoneInfo("America/New_York")).replace(tzinfo=None)
+        total_links = len(results)
+        broken_links = len([r for r in results if r['statusCode'] is None or r['statusCode'] >= 400])
+
+        async with conn.transaction():
+            recheckRunID = await conn.fetchval("""
+                INSERT INTO scan_runs (
+                    "scanID", "totalLinks", "brokenLinks", "runStartedAt", "runEndedAt",
+                    "createdAt", "modifiedAt", "runMode", "recheckOf"
+                ) VALUES ($1, $2, $3, $4, $5, $6, $6, 'recheck', $7)
+                RETURNING "runID";
+            """, scanID, total_links, broken_links, runStartedAt_naive, runEndedAt_naive, runEndedAt_naive, runID)
+
+            with timings.phase("dbInsert"):
+                await insert_link_results(conn, recheckRunID, scanID, results, runEndedAt_naive)
+            with timings.phase("diff"):
+                diff_counts = await compute_run_diff(conn, recheckRunID, scanID, previous_run_id=runID)
+            await store_timings(conn, recheckRunID, timings, started)
+
+            if on_commit:
+                await on_commit(conn, recheckRunID)
+
+        print(f"🔁 Recheck of runID {runID} done: {broken_links}/{total_links} still broken")
+        schedule_report_warmup(recheckRunID)
+
+        return {
+            "scanID": scanID,
+            "runID": recheckRunID,
+            "recheckOf": runID,
+            "totalLinks": total_links,
+            "brokenLinks": broken_links,
+            "changes": diff_counts
+        }
+
+    except Exception as e:
+        print(f"Error during recheck: {e}")
+        raise e
+    finally:
+        await conn.close()
+
+async def queue_scan_finished_email(conn, scanID: int, runID: int, startURL: str, total_links: int, broken_links: int):
+    owner = await conn.fetchrow("""
+        SELECT u.email, u.username
+        FROM scans s
+        JOIN users u ON u."UserID" = s."userID"
+        WHERE s."scanID" = $1
+    """, scanID)
+    if not owner:
+        return
+
+    subject = f"🔗 LinkSweep scan finished: {broken_links} broken link(s) on {startURL}"
+    plain_text = f"""
+        Hello {owner["username"]},
+
+        Your LinkSweep scan of {startURL} has finished.
+
+        Run ID: {runID}
+        Total links checked: {total_links}
+        Broken links: {broken_links}
+
+        Open the scan history in LinkSweep to review the results and download the report.
+
+        Regards,
+        LinkSweep Team
+    """
+    html_content = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif;">
+            <div style="max-width: 600px; margin: auto; padding: 20px; background: #f9f9f9; border-radius: 8px;">
+                <h2 style="color: #4F46E5;">🔗 Scan finished</h2>
+                <p>Hello {owner["username"]},</p>
+                <p>Your LinkSweep scan of <strong>{startURL}</strong> has finished.</p>
+                <table style="border-collapse: collapse; margin-top: 10px;">
+                    <tr><td style="padding: 6px 12px; background: #e2e8f0;">Run ID</td><td style="padding: 6px 12px;">{runID}</td></tr>
+                    <tr><td style="padding: 6px 12px; background: #e2e8f0;">Total links checked</td><td style="padding: 6px 12px;">{total_links}</td></tr>
+                    <tr><td style="padding: 6px 12px; background: #e2e8f0;">Broken links</td><td style="padding: 6px 12px;"><strong>{broken_links}</strong></td></tr>
+                </table>
+                <p>Open the scan history in LinkSweep to review the results and download the report.</p>
+                <p style="color: #999; margin-top: 30px;">– LinkSweep Team</p>
+            </div>
+            </body>
+        </html>
+    """
+    await queue_email(owner["email"], subject, plain_text, html_content, conn=conn)
@@ -0,0 +1,162 @@
+"""
+Standalone scan worker. Run as many of these as needed next to the API:
+
+    python -m core.scan_worker
+
+Each process leases queued runs from scan_jobs and runs up to
+SCAN_WORKER_CONCURRENCY of them at a time. API nodes only enqueue; set
+SCAN_WORKER_IN_PROCESS=false on them once dedicated workers are running.
+"""
+import asyncio
+import os
+import signal
+import socket
+from dotenv import load_dotenv
+from db.connection import get_connection
+from core.scan_jobs import (
+    SCAN_JOB_LEASE_SECONDS, SCAN_JOBS_CHANNEL, LeaseLost,
+    claim_job, renew_lease, complete_job, fail_job, release_job, fail_abandoned_jobs
+)
+from core.scan_runner import run_scan, run_recheck
+
+load_dotenv()
+
+SCAN_WORKER_CONCURRENCY = int(os.getenv("SCAN_WORKER_CONCURRENCY", "1"))
+SCAN_WORKER_POLL_SECONDS = float(os.getenv("SCAN_WORKER_POLL_SECONDS", "10"))
+# Standalone workers serve GET /metrics on this port when set (the API serves its own)
+SCAN_WORKER_METRICS_PORT = int(os.getenv("SCAN_WORKER_METRICS_PORT", "0"))
+
+# Several heartbeats fit in one lease, so a slow database round trip doesn't lose the job
+HEARTBEAT_SECONDS = SCAN_JOB_LEASE_SECONDS / 4
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+async def _heartbeat(job: dict, worker_id: str, scan_task: asyncio.Task):
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            conn = await get_connection()
+            try:
+                renewed = await renew_lease(conn, job["jobID"], worker_id)
+            finally:
+                await conn.close()
+        except Exception as e:
+            print(f"Heartbeat for job {job['jobID']} failed: {e}")
+            continue
+
+        if not renewed:
+            print(f"Lost the lease on job {job['jobID']}; stopping its scan")
+            scan_task.cancel()
+            return
+
+async def run_job(job: dict, worker_id: str):
+    async def on_commit(conn, run_id: int):
+        await complete_job(conn, job, worker_id, run_id)
+
+    if job["mode"] == "recheck":
+        scan = run_recheck(job["userID"], job["scanID"], job["recheckOf"], on_commit=on_commit)
+    else:
+        scan = run_scan(job["userID"], job["scanID"], on_commit=on_commit)
+
+    scan_task = asyncio.create_task(scan)
+    heartbeat = asyncio.create_task(_heartbeat(job, worker_id, scan_task))
+    try:
+        result = await scan_task
+        print(f"👷 Job {job['jobID']} finished as runID {result['runID']}")
+    except asyncio.CancelledError:
+        if heartbeat.done():
+            return  # lease lost; the worker that took over owns the job now
+        await release_job(job, worker_id)
+        raise
+    except LeaseLost as e:
+        print(e)
+    except Exception as e:
+        await fail_job(job, worker_id, str(e))
+    finally:
+        heartbeat.cancel()
+
+async def _claim(worker_id: str):
+    conn = await get_connection()
+    try:
+        await fail_abandoned_jobs(conn)
+        return await claim_job(conn, worker_id)
+    finally:
+        await conn.close()
+
+async def run_worker(worker_id: str = None, concurrency: int = SCAN_WORKER_CONCURRENCY):
+    """Lease and run queued scans until cancelled; running jobs are handed back on the way out."""
+    worker_id = worker_id or make_worker_id()
+    wakeup = asyncio.Event()
+    running = set()
+
+    def job_done(task):
+        running.discard(task)
+        wakeup.set()
+
+    listen_conn = None
+    try:
+        listen_conn = await get_connection()
+        await listen_conn.add_listener(SCAN_JOBS_CHANNEL, lambda *args: wakeup.set())
+    except Exception as e:
+        print(f"Scan worker can't LISTEN, polling only: {e}")
+
+    print(f"👷 Scan worker {worker_id} started ({concurrency} at a time)")
+    try:
+        while True:
+            wakeup.clear()
+            try:
+                while len(running) < concurrency:
+                    job = await _claim(worker_id)
+                    if not job:
+                        break
+                    print(f"👷 {worker_id} took job {job['jobID']} (scanID {job['scanID']}, attempt {job['attempts']})")
+                    task = asyncio.create_task(run_job(job, worker_id))
+                    running.add(task)
+                    task.add_done_callback(job_done)
+            except Exception as e:
+                print(f"Scan worker error: {e}")
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=SCAN_WORKER_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        for task in list(running):
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        if listen_conn:
+            await listen_conn.close()
+
+async def serve_metrics(port: int):
+    from aiohttp import web
+    from utils import metrics
+
+    async def handle(request):
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    print(f"📈 Worker metrics on :{port}/metrics")
+    return runner
+
+async def main():
+    metrics_server = await serve_metrics(SCAN_WORKER_METRICS_PORT) if SCAN_WORKER_METRICS_PORT else None
+    worker = asyncio.create_task(run_worker())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.cancel)
+    try:
+        await worker
+    except asyncio.CancelledError:
+        print("👷 Scan worker stopped")
+    finally:
+        if metrics_server:
+            await metrics_server.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from db.connection import get_connection
+from utils.cron import CronSchedule
+from core.scan_jobs import enqueue_scan
+
+load_dotenv()
+
+SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", "30"))
+
+# Scans of any kind (manual, recheck, scheduled) queued or running at once; due schedules
+# wait until the total drops below this
+MAX_CONCURRENT_SCANS = int(os.getenv("MAX_CONCURRENT_SCANS", "2"))
+
+# Default spread added to each start so scans due at the same minute don't start together
+DEFAULT_JITTER_MINUTES = int(os.getenv("SCHEDULE_JITTER_MINUTES", "15"))
+
+# A run still marked running after this long is assumed lost (normally the job table
+# reports failures back well before this)
+SCHEDULED_RUN_TIMEOUT_SECONDS = int(os.getenv("SCHEDULED_RUN_TIMEOUT_SECONDS", str(6 * 3600)))
+
+SCHEDULE_TIMEZONE = ZoneInfo("America/New_York")
+
+# Serializes claiming so the concurrency limit holds across workers
+SCHEDULER_LOCK_ID = 8_420_003
+
+def next_run_at(cron: str, jitter_seconds: int, after: datetime = None) -> datetime:
+    """Next cron time in New York wall-clock time, plus a random share of the jitter."""
+    after = (after or datetime.now(SCHEDULE_TIMEZONE)).astimezone(SCHEDULE_TIMEZONE)
+    local = CronSchedule(cron).next_after(after.replace(tzinfo=None))
+    return local.replace(tzinfo=SCHEDULE_TIMEZONE) + timedelta(seconds=random.randint(0, max(jitter_seconds, 0)))
+
+async def sync_schedule(conn, scan_id: int, config: Dict):
+    """
+    Create, update or remove a scan's schedule from its config
+    ("schedule": cron expression, optional "scheduleJitterMinutes").
+    Raises ValueError for an invalid expression.
+    """
+    cron = (config.get("schedule") or "").strip()
+    if not cron:
+        await conn.execute('DELETE FROM scan_schedules WHERE "scanID" = $1', scan_id)
+        return
+
+    jitter_seconds = int(config.get("scheduleJitterMinutes", DEFAULT_JITTER_MINUTES)) * 60
+    first_run = next_run_at(cron, jitter_seconds)
+    await conn.execute("""
+        INSERT INTO scan_schedules ("scanID", "cron", "jitterSeconds", "nextRunAt")
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT ("scanID") DO UPDATE SET
+            "cron" = EXCLUDED."cron",
+            "jitterSeconds" = EXCLUDED."jitterSeconds",
+            "enabled" = TRUE,
+            "nextRunAt" = CASE
+                WHEN scan_schedules."cron" = EXCLUDED."cron" AND scan_schedules."jitterSeconds" = EXCLUDED."jitterSeconds"
+                THEN scan_schedules."nextRunAt"
+                ELSE EXCLUDED."nextRunAt"
+            END,
+            "modifiedAt" = NOW()
+    """, scan_id, cron, jitter_seconds, first_run)
+
+async def enqueue_due_schedules(conn) -> list:
+    """
+    Queue scan jobs for the due schedules that fit under MAX_CONCURRENT_SCANS
+    and mark them running. Occurrences whose previous run is still going are
+    skipped. The job's worker clears the running mark when it finishes.
+    """
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", SCHEDULER_LOCK_ID)
+
+        # Forget runs whose worker died without reporting back
+        await conn.execute("""
+            UPDATE scan_schedules
+            SET "runningSince" = NULL, "lastStatus" = 'lost'
+            WHERE "runningSince" < NOW() - make_interval(secs => $1)
+        """, SCHEDULED_RUN_TIMEOUT_SECONDS)
+
+        due = await conn.fetch("""
+            SELECT s."scanID", s."cron", s."jitterSeconds", s."runningSince", sc."userID"
+            FROM scan_schedules s
+            JOIN scans sc ON sc."scanID" = s."scanID"
+            WHERE s."enabled" AND s."nextRunAt" <= NOW()
+              AND s."scanID" NOT IN (SELECT "scanID" FROM scan_deletions)
+            ORDER BY s."nextRunAt"
+            FOR UPDATE OF s
+        """)
+        if not due:
+            return []
+
+        running = await conn.fetchval("SELECT COUNT(*) FROM scan_jobs WHERE \"status\" IN ('queued', 'running')")
+        slots = MAX_CONCURRENT_SCANS - running
+
+        queued = []
+        for row in due:
+            if row["runningSince"] is not None:
+                await conn.execute("""
+                    UPDATE scan_schedules SET "nextRunAt" = $2, "lastStatus" = 'skipped'
+                    WHERE "scanID" = $1
+                """, row["scanID"], next_run_at(row["cron"], row["jitterSeconds"]))
+                print(f"⏭️ Skipping scheduled run of scanID {row['scanID']}: previous run still going")
+                continue
+
+            # Over the limit: stays due and starts when a slot frees up
+            if slots <= 0:
+                continue
+
+            await enqueue_scan(row["scanID"], row["userID"], scheduled=True, conn=conn)
+            await conn.execute("""
+                UPDATE scan_schedules SET "runningSince" = NOW(), "nextRunAt" = $2
+                WHERE "scanID" = $1
+            """, row["scanID"], next_run_at(row["cron"], row["jitterSeconds"]))
+            print(f"⏰ Queued scheduled scan of scanID {row['scanID']}")
+            queued.append(row)
+            slots -= 1
+
+        return queued
+
+async def run_scheduler():
+    """Queue due scheduled scans until cancelled."""
+    while True:
+        try:
+            conn = await get_connection()
+            try:
+                await enqueue_due_schedules(conn)
+            finally:
+                await conn.close()
+        except Exception as e:
+            print(f"Scheduler error: {e}")
+
+        await asyncio.sleep(SCHEDULER_POLL_SECONDS)
@@ -0,0 +1,156 @@
+"""
+Multi-process crawl of one site, enabled per scan with "crawlProcesses": N.
+
+Each page URL belongs to exactly one shard (crc32 of the URL modulo N), so
+the shard that owns a URL is the only one that can mark it visited and the
+dedup needs no shared state. Every process runs the normal page logic
+(process_page) on its own event loop. Internal links found on a page are
+handed to the owning shard's inbox queue, and results stream back to the
+parent, which merges them into the one run.
+
+Termination: `pending` counts pages queued but not yet handled. A page's
+outgoing links are counted before the page itself is, so it only reaches
+zero once every shard is idle with an empty inbox.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import zlib
+from typing import Dict, List
+
+from core import run_timings, request_limits
+from core.crawler import REQUEST_HEADERS, process_page, should_exclude
+from core.page_dedup import PageIndex
+
+# Upper bound on processes a scan config can ask for
+CRAWL_MAX_PROCESSES = int(os.getenv("CRAWL_MAX_PROCESSES", str(os.cpu_count() or 1)))
+
+RESULT_POLL_SECONDS = 0.1
+
+def shard_for(url: str, shards: int) -> int:
+    # crc32 rather than hash(): string hashes differ between processes
+    return zlib.crc32(url.encode()) % shards
+
+def _count(pending, lock, delta: int):
+    with lock:
+        pending.value += delta
+
+async def _crawl_shard(shard: int, inboxes, results, pending, lock, start_url, max_depth, timeout, exclude_paths, use_cache):
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    inbox = inboxes[shard]
+    shards = len(inboxes)
+    visited = set()
+    routed = set()  # links this shard already handed off, so nav menus aren't resent from every page
+    timings = run_timings.start()
+    pages = PageIndex()
+
+    async with aiohttp.ClientSession(headers=REQUEST_HEADERS) as session:
+        while True:
+            item = await loop.run_in_executor(None, inbox.get)
+            if item is None:
+                break
+
+            url, depth = item
+            if url not in visited and not should_exclude(url, exclude_paths):
+                visited.add(url)
+                try:
+                    page_results, internal_links = await process_page(session, url, start_url, timeout, exclude_paths, use_cache, pages)
+                except Exception as e:
+                    # One unparseable page shouldn't take the whole shard (and the crawl) down
+                    print(f"⚠️ Skipping {url}: {e!r}")
+                    page_results, internal_links = [], []
+                if page_results:
+                    results.put(("results", page_results))
+
+                if depth < max_depth:
+                    handoff = [link for link in dict.fromkeys(internal_links) if link not in routed]
+                    routed.update(handoff)
+                    _count(pending, lock, len(handoff))
+                    for link in handoff:
+                        inboxes[shard_for(link, shards)].put((link, depth + 1))
+
+            _count(pending, lock, -1)
+
+    # Queue items from one process arrive in order, so these follow all of its results
+    results.put(("pages", pages.to_dict()))
+    results.put(("done", timings.to_dict()))
+
+def _shard_main(shard, inboxes, results, pending, lock, start_url, max_depth, timeout, exclude_paths, use_cache, limits):
+    # Spawned processes start from the env defaults; use the parent's share instead
+    request_limits.configure(*limits)
+    asyncio.run(_crawl_shard(shard, inboxes, results, pending, lock, start_url, max_depth, timeout, exclude_paths, use_cache))
+
+async def start_sharded_crawl(start_url: str, max_depth: int, timeout: int, exclude_paths: List[str],
+                              use_cache: bool = True, processes: int = 2, pages: PageIndex = None) -> List[Dict]:
+    """
+    Same results as start_crawl, with the pages spread over `processes` worker processes.
+    Duplicate content is only skipped within a process, but `pages` gets the clusters from all of them.
+    """
+    processes = max(1, min(processes, CRAWL_MAX_PROCESSES))
+    ctx = multiprocessing.get_context("spawn")
+    inboxes = [ctx.Queue() for _ in range(processes)]
+    results = ctx.Queue()
+    lock = ctx.Lock()
+    pending = ctx.Value("l", 1, lock=False)
+    limits = request_limits.shard_limits(processes)
+
+    workers = [
+        ctx.Process(
+            target=_shard_main,
+            args=(shard, inboxes, results, pending, lock, start_url, max_depth, timeout, exclude_paths, use_cache, limits),
+            daemon=True,
+        )
+        for shard in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    print(f"🧩 Crawling {start_url} with {processes} processes")
+
+    inboxes[shard_for(start_url, processes)].put((start_url, 0))
+
+    merged: List[Dict] = []
+    finished = 0
+    stopping = False
+    completed = False
+    try:
+        while finished < processes:
+            try:
+                kind, payload = results.get_nowait()
+            except queue.Empty:
+                if not stopping and pending.value == 0:
+                    for inbox in inboxes:
+                        inbox.put(None)
+                    stopping = True
+                # A shard that dies takes its pending pages with it, so the others would wait forever
+                elif any(worker.exitcode is not None and (worker.exitcode != 0 or not stopping) for worker in workers):
+                    codes = ", ".join(str(worker.exitcode) for worker in workers if worker.exitcode is not None)
+                    raise RuntimeError(f"Crawl process exited before finishing (exit code {codes})")
+                await asyncio.sleep(RESULT_POLL_SECONDS)
+                continue
+
+            if kind == "results":
+                merged.extend(payload)
+            elif kind == "pages":
+                if pages is not None:
+                    pages.merge(payload)
+            else:
+                run_timings.current().merge(payload)
+                finished += 1
+        completed = True
+    finally:
+        if not completed:
+            # Cancelled or failed: shards may still have pages queued ahead of any sentinel
+            for worker in workers:
+                worker.terminate()
+            for inbox in inboxes:
+                inbox.cancel_join_thread()
+        # join() blocks, and this may be the API's event loop
+        await asyncio.gather(*(asyncio.to_thread(worker.join, 5) for worker in workers))
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
+    return merged
@@ -1,10 +1,15 @@
 import asyncpg
 import os
+import time
 from dotenv import load_dotenv
 from urllib.parse import urlparse
+from utils.metrics import Gauge, Histogram
 
 load_dotenv()
 
+CONNECTIONS_OPEN = Gauge("linksweep_db_connections_open", "Postgres connections currently open by this process")
+CONNECT_SECONDS = Histogram("linksweep_db_connect_seconds", "Time to open a Postgres connection")
+
 
 async def get_connection():
     # Get DB URL from environment or use a fallback
@@ -13,10 +18,16 @@ async def get_connection():
     # Parse the URL
     parsed_url = urlparse(db_url)
 
-    return await asyncpg.connect(
+    started = time.perf_counter()
+    conn = await asyncpg.connect(
         user=parsed_url.username,
         password=parsed_url.password,
         database=parsed_url.path.lstrip("/"),  # remove leading '/'
         host=parsed_url.hostname,
         port=parsed_url.port
     )
+    CONNECT_SECONDS.observe(time.perf_counter() - started)
+    CONNECTIONS_OPEN.inc()
+    # Called on close() as well as when the connection is lost
+    conn.add_termination_listener(lambda _conn: CONNECTIONS_OPEN.dec())
+    return conn
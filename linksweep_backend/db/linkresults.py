@@ -0,0 +1,377 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from db.connection import get_connection
+from core.diagnosis import diagnosis_code
+import base64
+import json
+
+# Rows per round trip when streaming a run's results through a server-side cursor
+CURSOR_PREFETCH = 1000
+
+# URLs interned per round trip when storing a run
+URL_BATCH_SIZE = 5000
+
+# link_checks partitions created ahead of the current month
+PARTITION_MONTHS_AHEAD = 2
+
+LINK_CHECK_COLUMNS = [
+    "runID", "scanID", "sourceID", "linkID", "status_code", "status_text",
+    "isInternal", "redirectedToLogin", "diagnosisCode", "checkedAt"
+]
+
+# Hostname of a result's link, lower-cased, for filtering and grouping in SQL
+HOST_SQL = """lower(substring("link" from '^[A-Za-z][A-Za-z0-9+.-]*://([^/:?#]+)'))"""
+
+BROKEN_SQL = '("status_code" IS NULL OR "status_code" >= 400)'
+
+STATUS_CLASS_SQL = {
+    "2xx": '"status_code" BETWEEN 200 AND 299',
+    "3xx": '"status_code" BETWEEN 300 AND 399',
+    "4xx": '"status_code" BETWEEN 400 AND 499',
+    "5xx": '"status_code" >= 500',
+    "error": '"status_code" IS NULL',
+    "broken": BROKEN_SQL,
+}
+
+LINK_TYPES = ("internal", "external")
+
+def _like_prefix(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+@dataclass
+class LinkResultFilters:
+    status_class: Optional[str] = None  # comma-separated, e.g. "4xx,error"
+    link_type: Optional[str] = None
+    host: Optional[str] = None
+    source_prefix: Optional[str] = None
+    search: Optional[str] = None
+    broken_only: bool = False
+
+    def to_sql(self, first_param: int = 2) -> Tuple[str, List]:
+        """
+        Build the extra WHERE conditions (each prefixed with AND) and their
+        arguments. Placeholders start at $first_param; $1 is the runID.
+        Raises ValueError for unknown filter values.
+        """
+        conditions, args = [], []
+
+        if self.broken_only:
+            conditions.append(BROKEN_SQL)
+
+        if self.status_class:
+            classes = [c.strip().lower() for c in self.status_class.split(",") if c.strip()]
+            unknown = [c for c in classes if c not in STATUS_CLASS_SQL]
+            if unknown:
+                raise ValueError(f"Unknown status class: {', '.join(unknown)}. Use {', '.join(STATUS_CLASS_SQL)}.")
+            conditions.append("(" + " OR ".join(STATUS_CLASS_SQL[c] for c in classes) + ")")
+
+        if self.link_type:
+            if self.link_type not in LINK_TYPES:
+                raise ValueError(f"Unknown link type: {self.link_type}. Use internal or external.")
+            args.append(self.link_type)
+            conditions.append(f'"link_type" = ${first_param + len(args) - 1}')
+
+        if self.host:
+            args.append(self.host.strip().lower())
+            conditions.append(f"{HOST_SQL} = ${first_param + len(args) - 1}")
+
+        if self.source_prefix:
+            args.append(_like_prefix(self.source_prefix) + "%")
+            conditions.append(f'"source_page" LIKE ${first_param + len(args) - 1}')
+
+        if self.search:
+            args.append("%" + _like_prefix(self.search.strip()) + "%")
+            param = f"${first_param + len(args) - 1}"
+            conditions.append(
+                f'("link" ILIKE {param} OR "source_page" ILIKE {param} '
+                f'OR "status_text" ILIKE {param} OR "diagnosis" ILIKE {param})'
+            )
+
+        return "".join(f" AND {condition}" for condition in conditions), args
+
+REPORT_COLUMNS = ["source_page", "link", "status_code", "status_text", "link_type", "fixGuide"]
+
+EXPORT_COLUMNS = [
+    "source_page", "link", "status_code", "status_text", "link_type",
+    "redirectedToLogin", "diagnosis", "fixGuide", "checkedAt"
+]
+
+def to_report_row(row) -> Dict:
+    return {
+        "sourcePage": row["source_page"],
+        "link": row["link"],
+        "statusCode": row["status_code"],
+        "statusText": row["status_text"],
+        "linkType": row["link_type"],
+        "fixGuide": row["fixGuide"]
+    }
+
+async def iter_link_rows(run_id: int, columns: List[str], filters: LinkResultFilters = None) -> AsyncIterator:
+    """Yield a run's linkresults records in checkedAt order through a server-side cursor."""
+    where, args = (filters or LinkResultFilters()).to_sql()
+    select = ", ".join(f'"{column}"' for column in columns)
+    query = f"""
+        SELECT {select}
+        FROM linkresults
+        WHERE "runID" = $1{where}
+        ORDER BY "checkedAt" ASC
+    """
+
+    conn = await get_connection()
+    try:
+        # asyncpg cursors only exist inside a transaction
+        async with conn.transaction():
+            async for row in conn.cursor(query, run_id, *args, prefetch=CURSOR_PREFETCH):
+                yield row
+    finally:
+        await conn.close()
+
+async def iter_link_results(run_id: int, filters: LinkResultFilters = None) -> AsyncIterator[Dict]:
+    """Yield a run's results as report dicts without loading the whole run into memory."""
+    async for row in iter_link_rows(run_id, REPORT_COLUMNS, filters):
+        yield to_report_row(row)
+
+# sort name -> (SQL expression, cursor value decoder). source_page + link break ties:
+# the crawler checks each link once per source page, so the triple is unique within a run.
+SORT_SQL = {
+    "checkedAt": ('"checkedAt"', datetime.fromisoformat),
+    "status": ('COALESCE("status_code", 0)', int),
+    "link": ('"link"', str),
+    "source_page": ('"source_page"', str),
+    "host": (f"COALESCE({HOST_SQL}, '')", str),
+}
+
+def encode_cursor(values: list) -> str:
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, source_page, link = json.loads(base64.urlsafe_b64decode(padded))
+        return [SORT_SQL[sort][1](sort_value), str(source_page), str(link)]
+    except Exception:
+        raise ValueError("Invalid pagination cursor.")
+
+async def fetch_link_page(
+    run_id: int,
+    filters: LinkResultFilters,
+    sort: str = "checkedAt",
+    descending: bool = False,
+    limit: Optional[int] = None,
+    after: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of a run's results using keyset pagination. Returns the rows
+    and the cursor for the next page (None on the last page). Without a
+    limit every matching row is returned.
+    """
+    if sort not in SORT_SQL:
+        raise ValueError(f"Unknown sort: {sort}. Use {', '.join(SORT_SQL)}.")
+
+    sort_sql = SORT_SQL[sort][0]
+    direction = "DESC" if descending else "ASC"
+    where, args = filters.to_sql()
+
+    if after:
+        sort_value, source_page, link = decode_cursor(after, sort)
+        first = len(args) + 2
+        args += [sort_value, source_page, link]
+        where += f' AND ({sort_sql}, "source_page", "link") {"<" if descending else ">"} (${first}, ${first + 1}, ${first + 2})'
+
+    query = f"""
+        SELECT "source_page", "link", "status_code", "status_text", "link_type", "fixGuide",
+               {sort_sql} AS sort_value
+        FROM linkresults
+        WHERE "runID" = $1{where}
+        ORDER BY {sort_sql} {direction}, "source_page" {direction}, "link" {direction}
+    """
+    if limit:
+        # Fetch one extra row to know whether another page exists
+        query += f" LIMIT {int(limit) + 1}"
+
+    conn = await get_connection()
+    try:
+        rows = await conn.fetch(query, run_id, *args)
+    finally:
+        await conn.close()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last["sort_value"], last["source_page"], last["link"]])
+
+    data = []
+    for row in rows:
+        item = dict(row)
+        item.pop("sort_value")
+        data.append(item)
+    return data, next_cursor
+
+GROUP_BY_SQL = {
+    "host": HOST_SQL,
+    "status_code": '"status_code"',
+    "source_page": '"source_page"',
+    "link_type": '"link_type"',
+}
+
+async def fetch_group_counts(conn, run_id: int, group_by: str, filters: LinkResultFilters, limit: Optional[int] = None) -> List[Dict]:
+    """Row counts per group (largest first) for a run's filtered results."""
+    where, args = filters.to_sql()
+    query = f"""
+        SELECT {GROUP_BY_SQL[group_by]} AS key, COUNT(*) AS count
+        FROM linkresults
+        WHERE "runID" = $1{where}
+        GROUP BY key
+        ORDER BY count DESC, key
+    """
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    return [{"key": row["key"], "count": row["count"]} for row in await conn.fetch(query, run_id, *args)]
+
+async def run_exists(run_id: int) -> bool:
+    conn = await get_connection()
+    try:
+        return bool(await conn.fetchval('SELECT 1 FROM scan_runs WHERE "runID" = $1', run_id))
+    finally:
+        await conn.close()
+
+# Hosts listed on report summaries; the rest are folded into "Other hosts"
+SUMMARY_TOP_HOSTS = 25
+
+async def fetch_report_summary(run_id: int) -> Dict:
+    """Counts for a run's report summary page, computed in SQL."""
+    conn = await get_connection()
+    try:
+        run = await conn.fetchrow("""
+            SELECT r."totalLinks", r."brokenLinks", s."startURL"
+            FROM scan_runs r
+            LEFT JOIN scans s ON s."scanID" = r."scanID"
+            WHERE r."runID" = $1
+        """, run_id)
+        if not run:
+            raise ValueError(f"No scan run found for runID {run_id}")
+
+        broken = LinkResultFilters(broken_only=True)
+        by_status = await fetch_group_counts(conn, run_id, "status_code", broken)
+        by_host = await fetch_group_counts(conn, run_id, "host", broken)
+    finally:
+        await conn.close()
+
+    host_counts = [(row["key"] or "(unknown)", row["count"]) for row in by_host[:SUMMARY_TOP_HOSTS]]
+    other_hosts = sum(row["count"] for row in by_host[SUMMARY_TOP_HOSTS:])
+    if other_hosts:
+        host_counts.append((f"Other hosts ({len(by_host) - SUMMARY_TOP_HOSTS})", other_hosts))
+
+    return {
+        "startURL": run["startURL"],
+        "totalLinks": run["totalLinks"],
+        "brokenLinks": run["brokenLinks"],
+        "byStatus": [
+            (str(row["key"]) if row["key"] is not None else "No response", row["count"])
+            for row in by_status
+        ],
+        "byHost": host_counts,
+    }
+
+
+async def intern_urls(conn, urls: List[str]) -> Dict[str, int]:
+    """Map each URL to its link_urls ID, inserting the ones not seen before."""
+    ids = {}
+    # Same insert order in every transaction, so runs sharing URLs wait on each other instead of deadlocking
+    unique = sorted(set(urls))
+    for i in range(0, len(unique), URL_BATCH_SIZE):
+        batch = unique[i:i + URL_BATCH_SIZE]
+        await conn.execute("""
+            INSERT INTO link_urls ("url")
+            SELECT u FROM unnest($1::text[]) AS u
+            ON CONFLICT ("urlHash") DO NOTHING
+        """, batch)
+        rows = await conn.fetch("""
+            SELECT "urlID", "url" FROM link_urls
+            WHERE "urlHash" = ANY(SELECT md5(u)::uuid FROM unnest($1::text[]) AS u)
+        """, batch)
+        ids.update((row["url"], row["urlID"]) for row in rows)
+    return ids
+
+async def insert_link_results(conn, run_id: int, scan_id: int, results: List[Dict], checked_at: datetime):
+    """Store a run's crawl results in the normalized tables with one COPY."""
+    # Normally already created by the cleanup worker; this covers a worker that hasn't run yet
+    await ensure_partitions(conn, months_ahead=0, start=checked_at)
+    url_ids = await intern_urls(conn, [url for r in results for url in (r["sourcePage"], r["link"])])
+
+    records = [
+        (
+            run_id,
+            scan_id,
+            url_ids[result["sourcePage"]],
+            url_ids[result["link"]],
+            result["statusCode"],
+            result["statusText"],
+            result["linkType"] == "internal",
+            bool(result.get("redirectedToLogin", False)),
+            result.get("diagnosisCode", diagnosis_code(result.get("diagnosis"))),
+            checked_at,
+        )
+        for result in results
+    ]
+    await conn.copy_records_to_table("link_checks", records=records, columns=LINK_CHECK_COLUMNS)
+
+def _month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"link_checks_{month:%Y_%m}"
+
+async def ensure_partitions(conn, months_ahead: int = PARTITION_MONTHS_AHEAD, start: datetime = None) -> List[str]:
+    """Create the monthly link_checks partitions from `start` (default now) onwards. Returns the new ones."""
+    month = _month_start(start or datetime.now(ZoneInfo("America/New_York")))
+    created = []
+    for offset in range(months_ahead + 1):
+        first = _add_months(month, offset)
+        name = partition_name(first)
+        if await conn.fetchval("SELECT to_regclass($1)", name):
+            continue
+        await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF link_checks
+            FOR VALUES FROM ('{first}') TO ('{_add_months(first, 1)}')
+        """)
+        created.append(name)
+    return created
+
+async def drop_partitions_before(conn, cutoff: datetime) -> List[str]:
+    """
+    Drop link_checks partitions whose whole month is older than `cutoff`.
+    Partitions are detached CONCURRENTLY first so readers and the run
+    inserts are never blocked; must not be called inside a transaction.
+    """
+    rows = await conn.fetch("""
+        SELECT c.relname, i.inhdetachpending
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'link_checks'::regclass
+    """)
+
+    dropped = []
+    for row in sorted(rows, key=lambda r: r["relname"]):
+        try:
+            year, month = row["relname"].rsplit("_", 2)[-2:]
+            first = date(int(year), int(month), 1)
+        except ValueError:
+            continue
+        if _add_months(first, 1) > cutoff.date():
+            continue
+
+        # A detach interrupted part-way has to be finished rather than restarted
+        mode = "FINALIZE" if row["inhdetachpending"] else "CONCURRENTLY"
+        await conn.execute(f'ALTER TABLE link_checks DETACH PARTITION {row["relname"]} {mode}')
+        await conn.execute(f'DROP TABLE {row["relname"]}')
+        dropped.append(row["relname"])
+    return dropped
@@ -0,0 +1,40 @@
+import asyncio
+from pathlib import Path
+from db.connection import get_connection
+from core.diagnosis import sync_diagnosis_table
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+# Arbitrary key so concurrent workers don't apply the same migration twice
+MIGRATION_LOCK_ID = 8_420_001
+
+async def apply_migrations():
+    conn = await get_connection()
+    try:
+        await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                "name" TEXT PRIMARY KEY,
+                "appliedAt" TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+        applied = {row["name"] for row in await conn.fetch('SELECT "name" FROM schema_migrations')}
+
+        for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            if path.name in applied:
+                continue
+
+            async with conn.transaction():
+                await conn.execute(path.read_text())
+                await conn.execute('INSERT INTO schema_migrations ("name") VALUES ($1)', path.name)
+            print(f"🗄️ Applied migration {path.name}")
+
+        # Reference data whose source of truth is the code
+        await sync_diagnosis_table(conn)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(apply_migrations())
@@ -0,0 +1,17 @@
+CREATE TABLE IF NOT EXISTS email_outbox (
+    "emailID" SERIAL PRIMARY KEY,
+    "toEmail" TEXT NOT NULL,
+    "subject" TEXT NOT NULL,
+    "plainText" TEXT NOT NULL,
+    "htmlContent" TEXT,
+    "status" TEXT NOT NULL DEFAULT 'pending',
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "nextAttemptAt" TIMESTAMP NOT NULL DEFAULT NOW(),
+    "lastError" TEXT,
+    "createdAt" TIMESTAMP NOT NULL DEFAULT NOW(),
+    "sentAt" TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS email_outbox_pending_idx
+    ON email_outbox ("nextAttemptAt")
+    WHERE "status" = 'pending';
@@ -0,0 +1,3 @@
+-- History views, exports and reports all read one run at a time
+CREATE INDEX IF NOT EXISTS linkresults_run_checked_idx
+    ON linkresults ("runID", "checkedAt");
@@ -0,0 +1,78 @@
+-- Normalized link result storage. Each URL is stored once in link_urls and
+-- per-run rows in link_checks hold only IDs, status and a diagnosis code.
+-- "linkresults" becomes a view with the original columns so readers are unchanged.
+
+CREATE TABLE IF NOT EXISTS link_urls (
+    "urlID" BIGSERIAL PRIMARY KEY,
+    "url" TEXT NOT NULL,
+    "urlHash" UUID GENERATED ALWAYS AS (md5("url")::uuid) STORED,
+    CONSTRAINT link_urls_hash_key UNIQUE ("urlHash")
+);
+
+CREATE TABLE IF NOT EXISTS link_diagnoses (
+    "diagnosisCode" SMALLINT PRIMARY KEY,
+    "diagnosis" TEXT,
+    "fixGuide" TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS link_checks (
+    "runID" INTEGER NOT NULL,
+    "scanID" INTEGER NOT NULL,
+    "sourceID" BIGINT NOT NULL REFERENCES link_urls ("urlID"),
+    "linkID" BIGINT NOT NULL REFERENCES link_urls ("urlID"),
+    "status_code" SMALLINT,
+    "status_text" TEXT,
+    "isInternal" BOOLEAN NOT NULL,
+    "redirectedToLogin" BOOLEAN NOT NULL DEFAULT FALSE,
+    "diagnosisCode" SMALLINT NOT NULL DEFAULT 0,
+    "checkedAt" TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS link_checks_run_idx ON link_checks ("runID", "checkedAt");
+
+-- Keep rows written before this migration readable through the view
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'linkresults' AND relkind = 'r') THEN
+        ALTER TABLE linkresults RENAME TO linkresults_legacy;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS linkresults_legacy (
+    "runID" INTEGER,
+    "scanID" INTEGER,
+    "source_page" TEXT,
+    "link" TEXT,
+    "status_code" INTEGER,
+    "status_text" TEXT,
+    "link_type" TEXT,
+    "checkedAt" TIMESTAMP,
+    "modifiedAt" TIMESTAMP,
+    "diagnosis" TEXT,
+    "redirectedToLogin" BOOLEAN,
+    "fixGuide" TEXT
+);
+
+CREATE OR REPLACE VIEW linkresults AS
+SELECT
+    c."runID",
+    c."scanID",
+    src."url" AS "source_page",
+    dst."url" AS "link",
+    c."status_code"::INTEGER AS "status_code",
+    c."status_text",
+    CASE WHEN c."isInternal" THEN 'internal' ELSE 'external' END AS "link_type",
+    c."checkedAt",
+    c."checkedAt" AS "modifiedAt",
+    d."diagnosis",
+    c."redirectedToLogin",
+    COALESCE(d."fixGuide", '') AS "fixGuide"
+FROM link_checks c
+JOIN link_urls src ON src."urlID" = c."sourceID"
+JOIN link_urls dst ON dst."urlID" = c."linkID"
+LEFT JOIN link_diagnoses d ON d."diagnosisCode" = c."diagnosisCode"
+UNION ALL
+SELECT
+    "runID", "scanID", "source_page", "link", "status_code", "status_text", "link_type",
+    "checkedAt", "modifiedAt", "diagnosis", "redirectedToLogin", "fixGuide"
+FROM linkresults_legacy;
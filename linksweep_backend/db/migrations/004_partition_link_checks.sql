@@ -0,0 +1,80 @@
+-- Partition link_checks by month of "checkedAt" so retention can drop whole
+-- months instead of deleting rows. New months are created ahead of time by
+-- the cleanup worker (db.linkresults.ensure_partitions).
+
+DROP VIEW IF EXISTS linkresults;
+
+ALTER TABLE link_checks RENAME TO link_checks_unpartitioned;
+ALTER INDEX IF EXISTS link_checks_run_idx RENAME TO link_checks_unpartitioned_run_idx;
+
+CREATE TABLE link_checks (
+    "runID" INTEGER NOT NULL,
+    "scanID" INTEGER NOT NULL,
+    "sourceID" BIGINT NOT NULL REFERENCES link_urls ("urlID"),
+    "linkID" BIGINT NOT NULL REFERENCES link_urls ("urlID"),
+    "status_code" SMALLINT,
+    "status_text" TEXT,
+    "isInternal" BOOLEAN NOT NULL,
+    "redirectedToLogin" BOOLEAN NOT NULL DEFAULT FALSE,
+    "diagnosisCode" SMALLINT NOT NULL DEFAULT 0,
+    "checkedAt" TIMESTAMP NOT NULL
+) PARTITION BY RANGE ("checkedAt");
+
+CREATE INDEX link_checks_run_idx ON link_checks ("runID", "checkedAt");
+
+-- One partition for every month that already has rows, plus this month and next
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', "checkedAt")::date FROM link_checks_unpartitioned
+        UNION
+        SELECT date_trunc('month', NOW())::date
+        UNION
+        SELECT (date_trunc('month', NOW()) + INTERVAL '1 month')::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF link_checks FOR VALUES FROM (%L) TO (%L)',
+            'link_checks_' || to_char(month, 'YYYY_MM'), month, (month + INTERVAL '1 month')::date
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO link_checks SELECT * FROM link_checks_unpartitioned;
+DROP TABLE link_checks_unpartitioned;
+
+-- Scan deletes are queued here and carried out in batches by the cleanup worker
+CREATE TABLE IF NOT EXISTS scan_deletions (
+    "scanID" INTEGER PRIMARY KEY,
+    "requestedBy" INTEGER,
+    "status" TEXT NOT NULL DEFAULT 'pending',
+    "deletedRows" BIGINT NOT NULL DEFAULT 0,
+    "lastError" TEXT,
+    "requestedAt" TIMESTAMP NOT NULL DEFAULT NOW(),
+    "finishedAt" TIMESTAMP
+);
+
+CREATE VIEW linkresults AS
+SELECT
+    c."runID",
+    c."scanID",
+    src."url" AS "source_page",
+    dst."url" AS "link",
+    c."status_code"::INTEGER AS "status_code",
+    c."status_text",
+    CASE WHEN c."isInternal" THEN 'internal' ELSE 'external' END AS "link_type",
+    c."checkedAt",
+    c."checkedAt" AS "modifiedAt",
+    d."diagnosis",
+    c."redirectedToLogin",
+    COALESCE(d."fixGuide", '') AS "fixGuide"
+FROM link_checks c
+JOIN link_urls src ON src."urlID" = c."sourceID"
+JOIN link_urls dst ON dst."urlID" = c."linkID"
+LEFT JOIN link_diagnoses d ON d."diagnosisCode" = c."diagnosisCode"
+UNION ALL
+SELECT
+    "runID", "scanID", "source_page", "link", "status_code", "status_text", "link_type",
+    "checkedAt", "modifiedAt", "diagnosis", "redirectedToLogin", "fixGuide"
+FROM linkresults_legacy;
@@ -0,0 +1,17 @@
+-- Broken-link changes between a run and the previous run of the same scan,
+-- written once when the run finishes (db.run_diffs.compute_run_diff).
+-- "currentStatus" is NULL on a fixed row when the link is no longer on the page.
+
+CREATE TABLE IF NOT EXISTS run_diffs (
+    "runID" INTEGER NOT NULL,
+    "previousRunID" INTEGER NOT NULL,
+    "change" TEXT NOT NULL,
+    "sourceID" BIGINT NOT NULL REFERENCES link_urls ("urlID"),
+    "linkID" BIGINT NOT NULL REFERENCES link_urls ("urlID"),
+    "currentStatus" SMALLINT,
+    "previousStatus" SMALLINT,
+    "firstSeenAt" TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS run_diffs_run_idx
+    ON run_diffs ("runID", "change", "sourceID", "linkID");
@@ -0,0 +1,3 @@
+-- Recheck runs only re-request the broken links of an earlier run
+ALTER TABLE scan_runs ADD COLUMN IF NOT EXISTS "runMode" TEXT NOT NULL DEFAULT 'full';
+ALTER TABLE scan_runs ADD COLUMN IF NOT EXISTS "recheckOf" INTEGER REFERENCES scan_runs ("runID") ON DELETE SET NULL;
@@ -0,0 +1,13 @@
+-- Recent answers for external links, shared by every scan (core.link_cache).
+-- Keyed by the same md5 hash as link_urls so lookups don't need the URL interned.
+CREATE TABLE IF NOT EXISTS link_status_cache (
+    "urlHash" UUID PRIMARY KEY,
+    "status_code" SMALLINT,
+    "status_text" TEXT,
+    "redirectedToLogin" BOOLEAN NOT NULL DEFAULT FALSE,
+    "diagnosisCode" SMALLINT NOT NULL DEFAULT 0,
+    "checkedAt" TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    "expiresAt" TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS link_status_cache_expires_idx ON link_status_cache ("expiresAt");
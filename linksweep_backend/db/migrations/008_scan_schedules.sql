@@ -0,0 +1,17 @@
+-- Recurring scans. The cron expression comes from the scan's config ("schedule");
+-- the rest is scheduler state so it survives restarts (core.scheduler).
+CREATE TABLE IF NOT EXISTS scan_schedules (
+    "scanID" INTEGER PRIMARY KEY REFERENCES scans ("scanID") ON DELETE CASCADE,
+    "cron" TEXT NOT NULL,
+    "jitterSeconds" INTEGER NOT NULL DEFAULT 0,
+    "enabled" BOOLEAN NOT NULL DEFAULT TRUE,
+    "nextRunAt" TIMESTAMPTZ NOT NULL,
+    "runningSince" TIMESTAMPTZ,
+    "lastRunAt" TIMESTAMPTZ,
+    "lastRunID" INTEGER,
+    "lastStatus" TEXT,
+    "lastError" TEXT,
+    "modifiedAt" TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS scan_schedules_due_idx ON scan_schedules ("nextRunAt") WHERE "enabled";
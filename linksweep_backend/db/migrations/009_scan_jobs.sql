@@ -0,0 +1,25 @@
+-- Queued scan runs. API nodes and the scheduler insert rows; scan workers
+-- (core.scan_worker) lease them with FOR UPDATE SKIP LOCKED and keep the
+-- lease alive with heartbeats. A lease that runs out is picked up again.
+CREATE TABLE IF NOT EXISTS scan_jobs (
+    "jobID" BIGSERIAL PRIMARY KEY,
+    "scanID" INTEGER NOT NULL REFERENCES scans ("scanID") ON DELETE CASCADE,
+    "userID" INTEGER,
+    "mode" TEXT NOT NULL DEFAULT 'full',
+    "recheckOf" INTEGER,
+    "scheduled" BOOLEAN NOT NULL DEFAULT FALSE,
+    "status" TEXT NOT NULL DEFAULT 'queued',
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "workerID" TEXT,
+    "leaseExpiresAt" TIMESTAMPTZ,
+    "heartbeatAt" TIMESTAMPTZ,
+    "runID" INTEGER,
+    "lastError" TEXT,
+    "queuedAt" TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    "startedAt" TIMESTAMPTZ,
+    "finishedAt" TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS scan_jobs_open_idx
+    ON scan_jobs ("queuedAt")
+    WHERE "status" IN ('queued', 'running');
@@ -0,0 +1,2 @@
+-- Per-phase seconds and counters for each run (core/run_timings.py)
+ALTER TABLE scan_runs ADD COLUMN IF NOT EXISTS "timings" JSONB;
@@ -0,0 +1,2 @@
+-- Groups of crawled URLs that served identical content (core/page_dedup.py)
+ALTER TABLE scan_runs ADD COLUMN IF NOT EXISTS "duplicatePages" JSONB;
@@ -0,0 +1,145 @@
+from typing import Dict, List, Optional, Tuple
+from db.connection import get_connection
+from db.linkresults import BROKEN_SQL, encode_cursor
+import base64
+import json
+
+DIFF_CHANGES = ("new", "fixed", "still_broken")
+
+async def find_previous_run(conn, run_id: int, scan_id: int) -> Optional[int]:
+    return await conn.fetchval("""
+        SELECT "runID" FROM scan_runs
+        WHERE "scanID" = $1 AND "runID" < $2 AND "runMode" = 'full'
+        ORDER BY "runID" DESC
+        LIMIT 1
+    """, scan_id, run_id)
+
+async def compute_run_diff(conn, run_id: int, scan_id: int, previous_run_id: int = None) -> Dict[str, int]:
+    """
+    Compare a finished run's broken links with the previous run of the same
+    scan (or `previous_run_id`) and store the result in run_diffs. Rows are matched on the interned
+    (source, link) URL IDs with one hash join, so it stays a single statement
+    however large the runs are. Returns the count per change.
+    """
+    if previous_run_id is None:
+        previous_run_id = await find_previous_run(conn, run_id, scan_id)
+    if previous_run_id is None:
+        return {}
+
+    # Runs stored before normalization have no URL IDs to match on
+    if await conn.fetchval('SELECT 1 FROM linkresults_legacy WHERE "runID" = $1 LIMIT 1', previous_run_id):
+        return {}
+
+    rows = await conn.fetch(f"""
+        WITH cur AS (
+            SELECT "sourceID", "linkID", "status_code", "checkedAt", {BROKEN_SQL} AS broken
+            FROM link_checks WHERE "runID" = $1
+        ),
+        prev AS (
+            SELECT "sourceID", "linkID", "status_code", "checkedAt"
+            FROM link_checks WHERE "runID" = $2 AND {BROKEN_SQL}
+        ),
+        prev_seen AS (
+            SELECT "sourceID", "linkID", "firstSeenAt"
+            FROM run_diffs WHERE "runID" = $2 AND "change" <> 'fixed'
+        ),
+        diff AS (
+            INSERT INTO run_diffs (
+                "runID", "previousRunID", "change", "sourceID", "linkID",
+                "currentStatus", "previousStatus", "firstSeenAt"
+            )
+            SELECT
+                $1, $2,
+                CASE
+                    WHEN p."sourceID" IS NULL THEN 'new'
+                    WHEN c.broken THEN 'still_broken'
+                    ELSE 'fixed'
+                END,
+                COALESCE(c."sourceID", p."sourceID"),
+                COALESCE(c."linkID", p."linkID"),
+                c."status_code",
+                p."status_code",
+                CASE
+                    WHEN p."sourceID" IS NULL THEN c."checkedAt"
+                    ELSE COALESCE(s."firstSeenAt", p."checkedAt")
+                END
+            FROM cur c
+            FULL JOIN prev p ON p."sourceID" = c."sourceID" AND p."linkID" = c."linkID"
+            LEFT JOIN prev_seen s ON s."sourceID" = p."sourceID" AND s."linkID" = p."linkID"
+            WHERE c.broken OR p."sourceID" IS NOT NULL
+            RETURNING "change"
+        )
+        SELECT "change", COUNT(*) AS count FROM diff GROUP BY "change"
+    """, run_id, previous_run_id)
+    return {row["change"]: row["count"] for row in rows}
+
+def _decode_diff_cursor(cursor: str) -> Tuple[str, int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        change, source_id, link_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(change), int(source_id), int(link_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor.")
+
+async def fetch_run_diff(
+    run_id: int,
+    change: Optional[str] = None,
+    limit: Optional[int] = None,
+    after: Optional[str] = None
+) -> Dict:
+    """Counts per change for a run plus one keyset page of the changed links."""
+    if change and change not in DIFF_CHANGES:
+        raise ValueError(f"Unknown change: {change}. Use {', '.join(DIFF_CHANGES)}.")
+
+    where, args = "", []
+    if change:
+        args.append(change)
+        where += f' AND d."change" = ${len(args) + 1}'
+    if after:
+        args += list(_decode_diff_cursor(after))
+        first = len(args) - 1
+        where += f' AND (d."change", d."sourceID", d."linkID") > (${first}, ${first + 1}, ${first + 2})'
+
+    query = f"""
+        SELECT d."change", d."sourceID", d."linkID", src."url" AS "source_page", dst."url" AS "link",
+               d."currentStatus", d."previousStatus", d."firstSeenAt"
+        FROM run_diffs d
+        JOIN link_urls src ON src."urlID" = d."sourceID"
+        JOIN link_urls dst ON dst."urlID" = d."linkID"
+        WHERE d."runID" = $1{where}
+        ORDER BY d."change", d."sourceID", d."linkID"
+    """
+    if limit:
+        query += f" LIMIT {int(limit) + 1}"
+
+    conn = await get_connection()
+    try:
+        counts = await conn.fetch("""
+            SELECT "change", "previousRunID", COUNT(*) AS count
+            FROM run_diffs WHERE "runID" = $1
+            GROUP BY "change", "previousRunID"
+        """, run_id)
+        rows = await conn.fetch(query, run_id, *args)
+    finally:
+        await conn.close()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last["change"], last["sourceID"], last["linkID"]])
+
+    data: List[Dict] = []
+    for row in rows:
+        item = dict(row)
+        item.pop("sourceID")
+        item.pop("linkID")
+        item["firstSeenAt"] = item["firstSeenAt"].isoformat()
+        data.append(item)
+
+    return {
+        "previousRunID": counts[0]["previousRunID"] if counts else None,
+        "counts": {c: next((row["count"] for row in counts if row["change"] == c), 0) for c in DIFF_CHANGES},
+        "data": data,
+        "nextCursor": next_cursor,
+    }
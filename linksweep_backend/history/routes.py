@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Path
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Path, Query
 from db.connection import get_connection
 from auth.dependencies import get_current_user
-from utils.pdf_generator import generate_pdf_report
-from utils.excel_generator import generate_excel_report
+from utils import report_cache
+from utils.report_cache import report_filename, iter_file
+from core.reports import get_report, REPORT_FORMATS
+from core.report_pool import ReportPoolBusy
+from db.run_diffs import fetch_run_diff
+from db.linkresults import LinkResultFilters, run_exists, iter_link_rows, fetch_link_page, fetch_group_counts, EXPORT_COLUMNS, GROUP_BY_SQL
+from utils.stream_export import csv_chunks, ndjson_chunks, gzip_chunks, accepts_gzip
 from typing import List, Optional
 from datetime import datetime
 from fastapi.responses import StreamingResponse
+import json
+import os
 
 history_router = APIRouter(prefix="/history", tags=["History"])
 
@@ -15,7 +22,8 @@ async def get_recent_scans(user: dict = Depends(get_current_user)):
     conn = await get_connection()
 
     rows = await conn.fetch("""
-        SELECT r."runID", r."scanID", s."startURL", r."totalLinks", r."brokenLinks", r."runStartedAt", r."runEndedAt"
+        SELECT r."runID", r."scanID", s."startURL", r."totalLinks", r."brokenLinks", r."runStartedAt", r."runEndedAt",
+               r."runMode", r."recheckOf"
         FROM scan_runs r
         JOIN scans s ON r."scanID" = s."scanID"
         ORDER BY r."runStartedAt" DESC
@@ -35,7 +43,8 @@ async def get_all_scan_runs(page: int = 1, page_size: int = 10):
     conn = await get_connection()
 
     rows = await conn.fetch("""
-        SELECT r."runID", r."scanID", s."startURL", r."totalLinks", r."brokenLinks", r."runStartedAt", r."runEndedAt"
+        SELECT r."runID", r."scanID", s."startURL", r."totalLinks", r."brokenLinks", r."runStartedAt", r."runEndedAt",
+               r."runMode", r."recheckOf"
         FROM scan_runs r
         JOIN scans s ON r."scanID" = s."scanID"
         ORDER BY r."runStartedAt" DESC
@@ -46,53 +55,204 @@ async def get_all_scan_runs(page: int = 1, page_size: int = 10):
     
     return {"success": True, "data": [dict(row) for row in rows]}
 
-# 3. Full Results for a Scan
+# 3. Full Results for a Scan (broken links by default; filter, sort and page server-side)
 @history_router.get("/{run_id}/full")
-async def get_full_scan_results(run_id: int = Path(..., description="Run ID to fetch")):
+async def get_full_scan_results(
+    run_id: int = Path(..., description="Run ID to fetch"),
+    status_class: Optional[str] = Query(None, description="Comma-separated: 2xx, 3xx, 4xx, 5xx, error, broken"),
+    link_type: Optional[str] = Query(None, description="internal or external"),
+    host: Optional[str] = Query(None, description="Only links pointing at this host"),
+    source_prefix: Optional[str] = Query(None, description="Only links found on pages starting with this URL"),
+    q: Optional[str] = Query(None, description="Text search over link, source page, status text and diagnosis"),
+    broken_only: bool = Query(True, description="Set to false to include working links"),
+    sort: str = Query("checkedAt", description="checkedAt, status, link, source_page or host"),
+    order: str = Query("asc", description="asc or desc"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every row"),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page")
+):
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Invalid order. Choose asc or desc.")
+
+    filters = LinkResultFilters(
+        status_class=status_class, link_type=link_type, host=host,
+        source_prefix=source_prefix, search=q, broken_only=broken_only
+    )
+    try:
+        rows, next_cursor = await fetch_link_page(run_id, filters, sort, order == "desc", limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"success": True, "data": rows, "nextCursor": next_cursor}
+
+
+SUMMARY_GROUPS = ["host", "status_code", "source_page"]
+
+# 3b. Aggregates for a Scan
+@history_router.get("/{run_id}/summary")
+async def get_scan_summary(
+    run_id: int = Path(..., description="Run ID to summarize"),
+    group_by: Optional[str] = Query(None, description="host, status_code, source_page or link_type; default: host, status_code and source_page"),
+    status_class: Optional[str] = Query(None, description="Comma-separated: 2xx, 3xx, 4xx, 5xx, error, broken"),
+    link_type: Optional[str] = Query(None, description="internal or external"),
+    host: Optional[str] = Query(None, description="Only links pointing at this host"),
+    source_prefix: Optional[str] = Query(None, description="Only links found on pages starting with this URL"),
+    q: Optional[str] = Query(None, description="Text search over link, source page, status text and diagnosis"),
+    broken_only: bool = Query(True, description="Set to false to include working links"),
+    limit: int = Query(50, ge=1, le=1000, description="Groups returned per dimension")
+):
+    groups = [g.strip() for g in group_by.split(",")] if group_by else SUMMARY_GROUPS
+    unknown = [g for g in groups if g not in GROUP_BY_SQL]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Invalid group_by: {', '.join(unknown)}")
+
+    filters = LinkResultFilters(
+        status_class=status_class, link_type=link_type, host=host,
+        source_prefix=source_prefix, search=q, broken_only=broken_only
+    )
+    try:
+        where, args = filters.to_sql()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     conn = await get_connection()
+    try:
+        total = await conn.fetchval(f'SELECT COUNT(*) FROM linkresults WHERE "runID" = $1{where}', run_id, *args)
+        data = {"total": total}
+        for group in groups:
+            data[group] = await fetch_group_counts(conn, run_id, group, filters, limit)
+        # URLs that served the same page (core/page_dedup.py); null for runs from before it was recorded
+        duplicates = await conn.fetchval('SELECT "duplicatePages" FROM scan_runs WHERE "runID" = $1', run_id)
+        data["duplicateContent"] = json.loads(duplicates)[:limit] if duplicates else None
+    finally:
+        await conn.close()
 
-    rows = await conn.fetch("""
-        SELECT "source_page", "link", "status_code", "status_text", "link_type", "fixGuide"
-        FROM linkresults
-        WHERE "runID" = $1 AND ("status_code" IS NULL OR "status_code" >= 400)
-        ORDER BY "checkedAt" ASC;
-    """, run_id)
+    return {"success": True, "data": data}
 
-    await conn.close()
-    return {"success": True, "data": [dict(row) for row in rows]}
 
+# 3c. Changes since the previous run of the same scan
+@history_router.get("/{run_id}/diff")
+async def get_run_diff(
+    run_id: int = Path(..., description="Run ID to compare with the scan's previous run"),
+    change: Optional[str] = Query(None, description="new, fixed or still_broken; default: all"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every row"),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page")
+):
+    try:
+        diff = await fetch_run_diff(run_id, change, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-# 4. Download PDF
-@history_router.get("/{run_id}/download")
-async def download_scan_pdf(run_id: int):
+    return {"success": True, **diff}
+
+
+# 3d. Where the run's time went (core/run_timings.py)
+@history_router.get("/{run_id}/timings")
+async def get_run_timings(run_id: int = Path(..., description="Run ID")):
     conn = await get_connection()
+    try:
+        row = await conn.fetchrow('SELECT "timings" FROM scan_runs WHERE "runID" = $1', run_id)
+    finally:
+        await conn.close()
 
-    rows = await conn.fetch("""
-        SELECT "source_page", "link", "status_code", "status_text", "link_type", "fixGuide"
-        FROM linkresults
-        WHERE "runID" = $1
-        ORDER BY "checkedAt" ASC;
-    """, run_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Run not found")
+    # Runs from before timings were recorded have none
+    timings = json.loads(row["timings"]) if row["timings"] else None
+    return {"success": True, "data": timings}
 
-    await conn.close()
 
-    results = []
-    for row in rows:
-        results.append({
-            "sourcePage": row["source_page"],
-            "link": row["link"],
-            "statusCode": row["status_code"],
-            "statusText": row["status_text"],
-            "linkType": row["link_type"],
-            "fixGuide": row["fixGuide"]
-        })
+async def open_report(run_id: int, report_format: str):
+    """
+    Get the cached report and open it. Opening first means a concurrent
+    eviction can't pull the file away mid-stream; if one removes it before
+    the open, the report is built once more.
+    """
+    for attempt in range(2):
+        path = await get_report(run_id, report_format)
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            if attempt:
+                raise
+
+
+# 4. Download report (Excel by default, PDF summary of broken links with ?format=pdf)
+@history_router.get("/{run_id}/download")
+async def download_scan_pdf(
+    request: Request,
+    run_id: int,
+    report_format: str = Query("xlsx", alias="format", description="xlsx or pdf")
+):
+    if report_format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format. Choose xlsx or pdf.")
+    if not await run_exists(run_id):
+        raise HTTPException(status_code=404, detail=f"No scan run found for runID {run_id}")
 
-    filename, file_stream = generate_excel_report(results, run_id)
+    try:
+        report_file = await open_report(run_id, report_format)
+    except ReportPoolBusy as busy:
+        raise HTTPException(
+            status_code=429,
+            detail="Report generation is busy. Please retry shortly.",
+            headers={"Retry-After": str(busy.retry_after)}
+        )
+    st = os.fstat(report_file.fileno())
+    etag = report_cache.etag_for(report_file.name, st)
+    if report_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        report_file.close()
+        return Response(status_code=304, headers={"ETag": etag})
 
-    print(f"📦 Sending Excel file with filename: {filename}")
+    filename = report_filename(run_id, report_format)
+    print(f"📦 Sending report with filename: {filename}")
 
     return StreamingResponse(
-        file_stream,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
\ No newline at end of file
+        iter_file(report_file),
+        media_type=REPORT_FORMATS[report_format][1],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(st.st_size),
+            "ETag": etag,
+            "Cache-Control": "private, no-cache"
+        }
+    )
+
+
+EXPORT_FORMATS = {
+    "csv": (csv_chunks, "text/csv; charset=utf-8"),
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+}
+
+# 5. Streaming CSV / NDJSON export
+@history_router.get("/{run_id}/export")
+async def export_scan_results(
+    request: Request,
+    run_id: int = Path(..., description="Run ID to export"),
+    export_format: str = Query("csv", alias="format", description="csv or ndjson"),
+    status_class: Optional[str] = Query(None, description="Comma-separated: 2xx, 3xx, 4xx, 5xx, error, broken"),
+    link_type: Optional[str] = Query(None, description="internal or external"),
+    host: Optional[str] = Query(None, description="Only links pointing at this host"),
+    broken_only: bool = Query(False, description="Same rows as the broken-links view")
+):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format. Choose csv or ndjson.")
+
+    filters = LinkResultFilters(status_class=status_class, link_type=link_type, host=host, broken_only=broken_only)
+    try:
+        filters.to_sql()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not await run_exists(run_id):
+        raise HTTPException(status_code=404, detail=f"No scan run found for runID {run_id}")
+
+    serialize, media_type = EXPORT_FORMATS[export_format]
+    body = serialize(iter_link_rows(run_id, EXPORT_COLUMNS, filters), EXPORT_COLUMNS)
+
+    headers = {"Content-Disposition": f"attachment; filename=scan_run_{run_id}.{export_format}"}
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
@@ -0,0 +1,85 @@
+"""
+Minimal 5-field cron expressions (minute hour day-of-month month day-of-week)
+for scan schedules. Supports *, lists, ranges and steps, e.g. "30 1 * * 1-5"
+or "*/15 0-6 * * *". Day-of-week is 0-6 with Sunday as 0 (7 also works).
+"""
+from datetime import datetime, timedelta
+from typing import List, Set
+
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+# Searching further than this means the expression can never match (e.g. Feb 30)
+MAX_SEARCH_DAYS = 366 * 5
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError("step must be at least 1")
+
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+
+        if start < low or end > high or start > end:
+            raise ValueError(f"{part} is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronSchedule:
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression '{expression}': expected 5 fields")
+        try:
+            parsed: List[Set[int]] = [
+                _parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+            ]
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression '{expression}': {e}")
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}
+        # Standard cron: when both day fields are restricted, either may match.
+        # Like vixie-cron, a field starting with "*" (e.g. "*/2") counts as unrestricted
+        self.any_day = fields[2].startswith("*")
+        self.any_weekday = fields[4].startswith("*")
+
+    def _day_matches(self, when: datetime) -> bool:
+        weekday = (when.weekday() + 1) % 7  # Python's Monday=0 -> cron's Sunday=0
+        day_ok = when.day in self.days
+        weekday_ok = weekday in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after` (naive wall-clock time)."""
+        when = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after + timedelta(days=MAX_SEARCH_DAYS)
+
+        while when <= limit:
+            if when.month not in self.months:
+                when = (when.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(when):
+                when = when.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if when.hour not in self.hours:
+                when = when.replace(minute=0) + timedelta(hours=1)
+                continue
+            if when.minute not in self.minutes:
+                when += timedelta(minutes=1)
+                continue
+            return when
+
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
@@ -1,19 +1,150 @@
-import smtplib
+import asyncio
 from email.message import EmailMessage
 import os
+import aiosmtplib
 from dotenv import load_dotenv
+from db.connection import get_connection
 
 load_dotenv()
 
-def send_email(to_email: str, subject: str, plain_text: str, html_content: str):
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"  # implicit TLS (port 465)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "10"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", "30"))
+OUTBOX_MAX_BACKOFF_SECONDS = 3600
+
+# How long a claimed row stays invisible to other workers while it is being sent
+OUTBOX_LEASE_SECONDS = 300
+
+# Set by queue_email so the worker in this process doesn't wait for the next poll
+_wakeup = asyncio.Event()
+
+async def queue_email(to_email: str, subject: str, plain_text: str, html_content: str = None, conn=None):
+    """
+    Store an email in the outbox. Pass the caller's connection to write it
+    in the same transaction as the row that triggered it.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = await get_connection()
+    try:
+        await conn.execute("""
+            INSERT INTO email_outbox ("toEmail", "subject", "plainText", "htmlContent")
+            VALUES ($1, $2, $3, $4)
+        """, to_email, subject, plain_text, html_content)
+    finally:
+        if own_conn:
+            await conn.close()
+
+    _wakeup.set()
+
+def build_message(to_email: str, subject: str, plain_text: str, html_content: str = None) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = os.getenv("EMAIL_SENDER")
     msg["To"] = to_email
 
     msg.set_content(plain_text)
-    msg.add_alternative(html_content, subtype='html')
+    if html_content:
+        msg.add_alternative(html_content, subtype='html')
+    return msg
+
+def _backoff_seconds(attempts: int) -> int:
+    return min(OUTBOX_BACKOFF_SECONDS * (2 ** (attempts - 1)), OUTBOX_MAX_BACKOFF_SECONDS)
+
+async def _claim_batch(conn):
+    # SKIP LOCKED lets several API workers drain the same outbox without sending twice
+    return await conn.fetch("""
+        UPDATE email_outbox
+        SET "nextAttemptAt" = NOW() + make_interval(secs => $2)
+        WHERE "emailID" IN (
+            SELECT "emailID" FROM email_outbox
+            WHERE "status" = 'pending' AND "nextAttemptAt" <= NOW()
+            ORDER BY "nextAttemptAt"
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING "emailID", "toEmail", "subject", "plainText", "htmlContent", "attempts"
+    """, OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS)
+
+async def _mark_failed_attempt(conn, row, error: str):
+    attempts = row["attempts"] + 1
+    if attempts >= OUTBOX_MAX_ATTEMPTS:
+        await conn.execute("""
+            UPDATE email_outbox SET "status" = 'failed', "attempts" = $2, "lastError" = $3
+            WHERE "emailID" = $1
+        """, row["emailID"], attempts, error)
+        print(f"📧 Giving up on email {row['emailID']} to {row['toEmail']}: {error}")
+    else:
+        await conn.execute("""
+            UPDATE email_outbox
+            SET "attempts" = $2, "lastError" = $3, "nextAttemptAt" = NOW() + make_interval(secs => $4)
+            WHERE "emailID" = $1
+        """, row["emailID"], attempts, error, _backoff_seconds(attempts))
+
+async def send_pending_emails() -> int:
+    """Send one batch from the outbox over a single SMTP connection. Returns the number sent."""
+    conn = await get_connection()
+    try:
+        rows = await _claim_batch(conn)
+        if not rows:
+            return 0
+
+        smtp = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, use_tls=SMTP_USE_TLS)
+        try:
+            await smtp.connect()
+            if os.getenv("EMAIL_PASSWORD"):
+                await smtp.login(os.getenv("EMAIL_SENDER"), os.getenv("EMAIL_PASSWORD"))
+        except Exception as e:
+            for row in rows:
+                await _mark_failed_attempt(conn, row, f"SMTP connect failed: {e}")
+            return 0
+
+        sent = 0
+        try:
+            for row in rows:
+                msg = build_message(row["toEmail"], row["subject"], row["plainText"], row["htmlContent"])
+                try:
+                    await smtp.send_message(msg)
+                except Exception as e:
+                    await _mark_failed_attempt(conn, row, str(e))
+                    continue
+
+                await conn.execute("""
+                    UPDATE email_outbox SET "status" = 'sent', "sentAt" = NOW(), "attempts" = "attempts" + 1
+                    WHERE "emailID" = $1
+                """, row["emailID"])
+                sent += 1
+        finally:
+            try:
+                await smtp.quit()
+            except Exception:
+                pass
+
+        print(f"📧 Sent {sent}/{len(rows)} queued emails")
+        return sent
+    finally:
+        await conn.close()
+
+async def run_outbox_worker():
+    """Drain the outbox until cancelled, waking early whenever queue_email() is called."""
+    while True:
+        _wakeup.clear()
+        try:
+            sent = await send_pending_emails()
+        except Exception as e:
+            print(f"Email outbox error: {e}")
+            sent = 0
+
+        # A full batch usually means more is waiting
+        if sent >= OUTBOX_BATCH_SIZE:
+            continue
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-        smtp.login(os.getenv("EMAIL_SENDER"), os.getenv("EMAIL_PASSWORD"))
-        smtp.send_message(msg)
\ No newline at end of file
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -1,71 +1,119 @@
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
-from zoneinfo import ZoneInfo
-from datetime import datetime
-import io, os, time
+from typing import AsyncIterator
+from utils.report_cache import report_filename
+import io, tempfile
 
-os.environ["TZ"] = "America/New_York"
-time.tzset()
+HEADERS = ["Source Page", "Link", "Status", "Link Type", "Fix Guide"]
 
-def generate_excel_report(broken_links: list[dict], scan_id: int):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Broken Links Report"
-
-    # Define header and styles
-    headers = ["Source Page", "Link", "Status", "Link Type", "Fix Guide"]
-
-    # Styles
-    header_font = Font(bold=True)
-    center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    gray_fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
-    border = Border(
-        left=Side(border_style="thin"),
-        right=Side(border_style="thin"),
-        top=Side(border_style="thin"),
-        bottom=Side(border_style="thin")
-    )
-
-    # Write headers with styles
-    for col_index, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_index, value=header)
-        cell.font = header_font
-        cell.fill = gray_fill
-        cell.alignment = center_alignment
+# Rows inspected to size columns before the write-only sheet is started
+WIDTH_SAMPLE_ROWS = 500
+
+# Reports up to this size stay in memory; larger ones spill to a temp file
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Styles
+header_font = Font(bold=True)
+center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+wrap_alignment = Alignment(vertical="center", wrap_text=True)
+gray_fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+border = Border(
+    left=Side(border_style="thin"),
+    right=Side(border_style="thin"),
+    top=Side(border_style="thin"),
+    bottom=Side(border_style="thin")
+)
+
+def _row_values(item: dict) -> list:
+    return [
+        item["sourcePage"],
+        item["link"],
+        f'{item["statusCode"]} - {item["statusText"] or ""}',
+        item["linkType"],
+        item["fixGuide"],
+    ]
+
+class ExcelReportWriter:
+    """
+    Write-only workbook: rows are flushed to disk as they are appended,
+    so memory stays flat regardless of how many results a run has.
+    """
+
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Broken Links Report")
+        self._started = False
+
+    def _cell(self, value, alignment, font=None, fill=None):
+        cell = WriteOnlyCell(self.ws, value=value)
+        cell.alignment = alignment
         cell.border = border
+        if font:
+            cell.font = font
+        if fill:
+            cell.fill = fill
+        return cell
 
-    # Write data rows
-    for row_index, item in enumerate(broken_links, 2):
-        ws.cell(row=row_index, column=1, value=item["sourcePage"])
-        ws.cell(row=row_index, column=2, value=item["link"])
-        ws.cell(row=row_index, column=3, value=str(item["statusCode"]) + " - " + item["statusText"])
-        ws.cell(row=row_index, column=4, value=item["linkType"])
-        ws.cell(row=row_index, column=5, value=item["fixGuide"])
-
-        for col_index in range(1, 6):
-            cell = ws.cell(row=row_index, column=col_index)
-            cell.alignment = center_alignment if col_index == 3 or col_index == 4 else Alignment(vertical="center", wrap_text=True)
-            cell.border = border
-
-    # Adjust column widths
-    for i, column_cells in enumerate(ws.columns, 1):
-        max_length = max(len(str(cell.value)) if cell.value else 0 for cell in column_cells)
-        col_letter = get_column_letter(i)
-        ws.column_dimensions[col_letter].width = min(max_length + 5, 50)
+    def start(self, sample: list[dict]):
+        # Column widths must be set before the first row is written
+        widths = [len(header) for header in HEADERS]
+        for item in sample:
+            for i, value in enumerate(_row_values(item)):
+                widths[i] = max(widths[i], len(str(value)) if value else 0)
+        for i, width in enumerate(widths, 1):
+            self.ws.column_dimensions[get_column_letter(i)].width = min(width + 5, 50)
+
+        self.ws.append([self._cell(header, center_alignment, header_font, gray_fill) for header in HEADERS])
+        self._started = True
+
+    def append(self, item: dict):
+        self.ws.append([
+            self._cell(value, center_alignment if col_index in (3, 4) else wrap_alignment)
+            for col_index, value in enumerate(_row_values(item), 1)
+        ])
+
+    def save(self, fileobj):
+        if not self._started:
+            self.start([])
+        self.wb.save(fileobj)
+        fileobj.seek(0)
+        return fileobj
+
+def generate_excel_report(broken_links: list[dict], scan_id: int):
+    writer = ExcelReportWriter()
+    writer.start(broken_links[:WIDTH_SAMPLE_ROWS])
+    for item in broken_links:
+        writer.append(item)
 
     # Save to in-memory buffer
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    output = writer.save(io.BytesIO())
+    return report_filename(scan_id), output
+
+async def stream_excel_report(rows: AsyncIterator[dict], scan_id: int, output=None):
+    """
+    Build the report from an async row source (e.g. an asyncpg cursor).
+    Only the first WIDTH_SAMPLE_ROWS rows are buffered to size the columns.
+    Writes to `output` (a spooled temp file by default) and returns the
+    filename and that file positioned at the start.
+    """
+    writer = ExcelReportWriter()
+
+    sample = []
+    async for item in rows:
+        sample.append(item)
+        if len(sample) >= WIDTH_SAMPLE_ROWS:
+            break
 
-    try:
-        time.tzset()
-    except AttributeError:
-        pass
+    writer.start(sample)
+    for item in sample:
+        writer.append(item)
+    del sample
 
-    # Generate filename
-    now_str = datetime.now(ZoneInfo("America/New_York")).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Scan_Report_{scan_id}_{now_str}.xlsx"
+    async for item in rows:
+        writer.append(item)
 
-    return filename, output 
\ No newline at end of file
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    return report_filename(scan_id), writer.save(output)
@@ -0,0 +1,94 @@
+"""
+Tiny plaintext SMTP server for local development and tests.
+
+    python -m utils.local_smtp --port 1025
+
+then run the API with SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_USE_TLS=false.
+Received messages are printed and kept in LocalSMTPServer.messages.
+"""
+import argparse
+import asyncio
+from email import message_from_bytes
+from email.message import Message
+from typing import List
+
+
+class LocalSMTPServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025, fail_every: int = 0):
+        self.host = host
+        self.port = port
+        self.fail_every = fail_every  # reject every Nth message to exercise retries
+        self.messages: List[Message] = []
+        self._received = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write((line + "\r\n").encode())
+            await writer.drain()
+
+        await reply("220 localhost LinkSweep test SMTP")
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command = raw.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb in ("EHLO", "HELO"):
+                    await reply("250-localhost")
+                    await reply("250 AUTH PLAIN LOGIN")
+                elif verb == "AUTH":
+                    await reply("235 Authentication successful")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        line = await reader.readline()
+                        if not line or line in (b".\r\n", b".\n"):
+                            break
+                        lines.append(line[1:] if line.startswith(b"..") else line)
+                    self._received += 1
+                    if self.fail_every and self._received % self.fail_every == 0:
+                        await reply("451 Temporary failure, try again later")
+                        continue
+                    msg = message_from_bytes(b"".join(lines))
+                    self.messages.append(msg)
+                    print(f"📨 {msg['To']}: {msg['Subject']}")
+                    await reply("250 Message accepted")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local SMTP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+
+    server = await LocalSMTPServer(args.host, args.port, args.fail_every).start()
+    print(f"Listening on {server.host}:{server.port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,29 +1,214 @@
-from reportlab.lib.pagesizes import letter
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.utils import simpleSplit
 from reportlab.pdfgen import canvas
+from zoneinfo import ZoneInfo
 from datetime import datetime
+from functools import lru_cache
+from typing import AsyncIterator
+import tempfile
 
-def generate_pdf_report(scan_id, results, output_path=None):
-    if output_path is None:
-        output_path = f"scan_{scan_id}_report.pdf"
-
-    c = canvas.Canvas(output_path, pagesize=letter)
-    width, height = letter
-
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, height - 50, f"LinkSweep Scan Report")
-    c.setFont("Helvetica", 12)
-    c.drawString(50, height - 70, f"Scan ID: {scan_id}")
-    c.drawString(50, height - 85, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-    y = height - 110
-    for res in results:
-        line = f"[{res['statusCode']}] {res['statusText']} - {res['link']}"
-        c.drawString(50, y, line)
-        y -= 15
-        if y < 50:
-            c.showPage()
-            y = height - 50
-
-    c.save()
-    print(f"📄 PDF Report saved to {output_path}")
-    return output_path   # ✅ IMPORTANT: Return file path
\ No newline at end of file
+PAGE_SIZE = landscape(letter)
+MARGIN = 40
+FONT = "Helvetica"
+BOLD_FONT = "Helvetica-Bold"
+FONT_SIZE = 8
+LINE_HEIGHT = 10
+CELL_PADDING = 3
+
+# Long URLs are cut after this many lines so one row can't take over a page
+MAX_LINES_PER_CELL = 4
+
+# (header, key, width) for the broken-links table; widths add up to the printable width
+TABLE_COLUMNS = [
+    ("Status", "status", 80),
+    ("Link", "link", 250),
+    ("Source Page", "sourcePage", 210),
+    ("Fix Guide", "fixGuide", 172),
+]
+
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+_char_widths: dict = {}
+
+def _char_width(char: str) -> float:
+    width = _char_widths.get(char)
+    if width is None:
+        width = _char_widths[char] = stringWidth(char, FONT, FONT_SIZE)
+    return width
+
+def _hard_wrap(word: str, width: float) -> list[str]:
+    """Break a token with no spaces (usually a URL) at character level."""
+    lines, start, current_width = [], 0, 0.0
+    for i, char in enumerate(word):
+        char_width = _char_width(char)
+        if i > start and current_width + char_width > width:
+            lines.append(word[start:i])
+            start, current_width = i, 0.0
+        current_width += char_width
+    lines.append(word[start:])
+    return lines
+
+# Source pages and fix guides repeat on almost every row
+@lru_cache(maxsize=4096)
+def _wrap_cached(text: str, width: float) -> tuple:
+    return tuple(_wrap(text, width))
+
+def wrap_text(text, width: float) -> list[str]:
+    return list(_wrap_cached(str(text or ""), width))
+
+def _wrap(text: str, width: float) -> list[str]:
+    lines = []
+    for line in simpleSplit(text, FONT, FONT_SIZE, width):
+        if stringWidth(line, FONT, FONT_SIZE) > width:
+            lines.extend(_hard_wrap(line, width))
+        else:
+            lines.append(line)
+
+    if len(lines) > MAX_LINES_PER_CELL:
+        lines = lines[:MAX_LINES_PER_CELL]
+        lines[-1] = lines[-1][:-1] + "…"
+    return lines or [""]
+
+class PdfReportWriter:
+    """
+    Draws the report straight onto a canvas page by page: a summary page
+    followed by a wrapped table of broken links.
+    """
+
+    def __init__(self, output, run_id: int, start_url: str = None):
+        self.c = canvas.Canvas(output, pagesize=PAGE_SIZE, pageCompression=1)
+        self.width, self.height = PAGE_SIZE
+        self.run_id = run_id
+        self.start_url = start_url
+        self.page_number = 0
+        self.y = 0
+
+    def _footer(self):
+        self.page_number += 1
+        self.c.setFont(FONT, 7)
+        self.c.drawRightString(self.width - MARGIN, MARGIN / 2, f"LinkSweep · Run {self.run_id} · Page {self.page_number}")
+
+    def _new_page(self):
+        self._footer()
+        self.c.showPage()
+        self.y = self.height - MARGIN
+
+    def write_summary(self, summary: dict):
+        c = self.c
+        self.y = self.height - MARGIN
+
+        c.setFont(BOLD_FONT, 16)
+        c.drawString(MARGIN, self.y, "LinkSweep Scan Report")
+        self.y -= 22
+
+        c.setFont(FONT, 10)
+        generated = datetime.now(ZoneInfo("America/New_York")).strftime("%Y-%m-%d %H:%M:%S")
+        details = [
+            f"Run ID: {self.run_id}",
+            f"Start URL: {self.start_url or '-'}",
+            f"Generated: {generated}",
+            f"Total links checked: {summary['totalLinks']}",
+            f"Broken links: {summary['brokenLinks']}",
+        ]
+        for line in details:
+            c.drawString(MARGIN, self.y, line)
+            self.y -= 14
+
+        self.y -= 10
+        self._write_count_table("Broken links by status", "Status", summary["byStatus"])
+        self.y -= 10
+        self._write_count_table("Broken links by host", "Host", summary["byHost"])
+
+    def _write_count_table(self, title: str, label: str, counts: list):
+        c = self.c
+        if self.y < MARGIN + 60:
+            self._new_page()
+
+        c.setFont(BOLD_FONT, 11)
+        c.drawString(MARGIN, self.y, title)
+        self.y -= 16
+
+        c.setFont(BOLD_FONT, FONT_SIZE)
+        c.drawString(MARGIN, self.y, label)
+        c.drawRightString(MARGIN + 400, self.y, "Count")
+        self.y -= LINE_HEIGHT + 2
+
+        c.setFont(FONT, FONT_SIZE)
+        for name, count in counts:
+            if self.y < MARGIN:
+                self._new_page()
+                c.setFont(FONT, FONT_SIZE)
+            c.drawString(MARGIN, self.y, wrap_text(name, 340)[0])
+            c.drawRightString(MARGIN + 400, self.y, str(count))
+            self.y -= LINE_HEIGHT
+
+        if not counts:
+            c.drawString(MARGIN, self.y, "No broken links")
+            self.y -= LINE_HEIGHT
+
+    def _table_header(self):
+        c = self.c
+        c.setFillGray(0.85)
+        c.rect(MARGIN, self.y - LINE_HEIGHT - CELL_PADDING, self.width - 2 * MARGIN, LINE_HEIGHT + 2 * CELL_PADDING, stroke=0, fill=1)
+        c.setFillGray(0)
+        c.setFont(BOLD_FONT, FONT_SIZE)
+        x = MARGIN
+        for header, _, width in TABLE_COLUMNS:
+            c.drawString(x + CELL_PADDING, self.y - LINE_HEIGHT + 2, header)
+            x += width
+        self.y -= LINE_HEIGHT + 2 * CELL_PADDING
+
+    def start_table(self):
+        self._new_page()
+        self.c.setFont(BOLD_FONT, 12)
+        self.c.drawString(MARGIN, self.y, "Broken links")
+        self.y -= 18
+        self._table_header()
+
+    def append(self, item: dict):
+        values = dict(item, status=f'{item["statusCode"]} {item["statusText"] or ""}'.strip())
+        cells = [wrap_text(values[key], width - 2 * CELL_PADDING) for _, key, width in TABLE_COLUMNS]
+        row_height = max(len(lines) for lines in cells) * LINE_HEIGHT + 2 * CELL_PADDING
+
+        if self.y - row_height < MARGIN:
+            self._new_page()
+            self._table_header()
+
+        c = self.c
+        c.setFont(FONT, FONT_SIZE)
+        x = MARGIN
+        for lines, (_, _, width) in zip(cells, TABLE_COLUMNS):
+            text_y = self.y - CELL_PADDING - LINE_HEIGHT + 2
+            for line in lines:
+                c.drawString(x + CELL_PADDING, text_y, line)
+                text_y -= LINE_HEIGHT
+            x += width
+
+        self.y -= row_height
+        c.setStrokeGray(0.8)
+        c.line(MARGIN, self.y, self.width - MARGIN, self.y)
+        c.setStrokeGray(0)
+
+    def save(self):
+        self._footer()
+        self.c.save()
+
+async def stream_pdf_report(rows: AsyncIterator[dict], run_id: int, summary: dict, start_url: str = None, output=None):
+    """
+    Render the summary page and the broken-links table from an async row
+    source. Pages are drawn as rows arrive; the PDF is written to `output`
+    (a spooled temp file by default), which is returned at position 0.
+    """
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
+    writer = PdfReportWriter(output, run_id, start_url)
+    writer.write_summary(summary)
+    writer.start_table()
+    async for item in rows:
+        writer.append(item)
+    writer.save()
+
+    output.seek(0)
+    return output
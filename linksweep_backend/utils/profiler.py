@@ -0,0 +1,55 @@
+"""
+Small sampling profiler for scan runs, enabled per scan with "profile": true.
+
+A background thread looks at the event loop thread's stack every
+PROFILE_INTERVAL_MS and counts identical stacks. The output is the
+"folded" format (one "frame;frame;frame count" line per stack), which
+flamegraph.pl, speedscope and inferno read directly. When the worker runs
+several scans at once their samples end up in the same profile.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+
+PROFILE_DIR = os.getenv("SCAN_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="scan-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, name: str) -> str:
+        """Write the folded stacks to PROFILE_DIR/<name>.folded and return the path."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}.folded")
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Set
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Finished runs never change, so a generated report can be reused until evicted
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join("reports", "cache"))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+_build_locks: Dict[str, asyncio.Lock] = {}
+
+def report_filename(scan_id: int, extension: str = "xlsx") -> str:
+    now_str = datetime.now(ZoneInfo("America/New_York")).strftime("%Y-%m-%d_%H-%M-%S")
+    return f"Scan_Report_{scan_id}_{now_str}.{extension}"
+
+def iter_file(fileobj, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Yield a file in chunks for StreamingResponse, closing it when done."""
+    try:
+        while chunk := fileobj.read(chunk_size):
+            yield chunk
+    finally:
+        fileobj.close()
+
+def cache_key(run_id: int, fmt: str, variant: str = "all") -> str:
+    return f"run-{int(run_id)}_{variant}.{fmt}"
+
+def cache_path(key: str) -> str:
+    return os.path.join(REPORT_CACHE_DIR, key)
+
+def etag_for(path: str, st: os.stat_result = None) -> str:
+    st = st or os.stat(path)
+    return f'"{os.path.basename(path)}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def _touch(path: str):
+    # Reads bump atime only, so the ETag (mtime + size) stays stable
+    st = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+
+def evict(max_bytes: int = None, keep: Set[str] = frozenset()):
+    """Delete least recently used reports, except the `keep` keys, until the cache fits in max_bytes."""
+    max_bytes = REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        entries = [entry for entry in os.scandir(REPORT_CACHE_DIR) if entry.is_file() and not entry.name.startswith(".")]
+    except FileNotFoundError:
+        return
+
+    stats = [(entry.path, entry.stat()) for entry in entries]
+    total = sum(st.st_size for _, st in stats)
+    for path, st in sorted(stats, key=lambda item: item[1].st_atime_ns):
+        if total <= max_bytes:
+            break
+        if os.path.basename(path) in keep:
+            continue
+        try:
+            os.remove(path)
+            total -= st.st_size
+        except FileNotFoundError:
+            pass
+
+def invalidate_run(run_id: int):
+    """Drop every cached report for a run (e.g. when its results are deleted)."""
+    prefix = f"run-{int(run_id)}_"
+    try:
+        for entry in os.scandir(REPORT_CACHE_DIR):
+            if entry.name.startswith(prefix):
+                os.remove(entry.path)
+    except FileNotFoundError:
+        pass
+
+def lookup(key: str) -> Optional[str]:
+    path = cache_path(key)
+    try:
+        _touch(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+async def get_or_build(key: str, build: Callable[[str], Awaitable[None]]) -> str:
+    """
+    Return the cached report path for `key`, building it first if needed.
+    `build` receives a temp file path in the cache directory to write the
+    report to; it is moved into place once the build succeeds.
+    """
+    path = lookup(key)
+    if path:
+        return path
+
+    lock = _build_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        path = lookup(key)
+        if path:
+            return path
+
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=REPORT_CACHE_DIR, prefix=".building-")
+        os.close(fd)
+        try:
+            await build(tmp_path)
+            os.replace(tmp_path, cache_path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        finally:
+            _build_locks.pop(key, None)
+
+    # Never the report just built, even if it alone is over the limit
+    evict(keep={key})
+    return cache_path(key)